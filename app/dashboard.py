@@ -1,9 +1,15 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+import json
 from io import BytesIO
 import sys
 sys.path.append(".")
 
+# columns the cards and filters use; everything else in the artifact is skipped
+DISPLAY_COLUMNS = ["repo_name", "stars", "forks", "star_velocity", "viral_prob", "trending_prob"]
+MIN_PROB = 0.5
+
 st.set_page_config(
     page_title="GitPulse - GitHub Viral Predictor",
     page_icon="🚀",
@@ -132,21 +138,37 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def read_predictions(data):
+    names = pq.read_schema(BytesIO(data)).names
+    columns = [c for c in DISPLAY_COLUMNS if c in names]
+    # row groups whose max viral_prob is below the slider minimum are never decoded
+    return pq.read_table(
+        BytesIO(data), columns=columns, filters=[("viral_prob", ">=", MIN_PROB)]
+    ).to_pandas()
+
 @st.cache_data(ttl=300)
 def load_data():
     try:
         sys.path.append(".")
 
         from ingest.config import get_s3_client, R2_BUCKET
+        from ingest.storage import get_objects
         s3 = get_s3_client()
-        response = s3.get_object(Bucket=R2_BUCKET, Key="predictions/latest.parquet")
-        df = pd.read_parquet(BytesIO(response["Body"].read()))
-        return df
+        objects = get_objects(s3, ["predictions/summary.json", "predictions/serving.parquet"])
+        if None in objects.values():
+            # predictions written before the serving artifact existed
+            summary = None
+            data = s3.get_object(Bucket=R2_BUCKET, Key="predictions/latest.parquet")["Body"].read()
+        else:
+            summary = json.loads(objects["predictions/summary.json"])
+            data = objects["predictions/serving.parquet"]
+        df = read_predictions(data)
+        return df, summary
     except Exception as e:
         st.error(f"Failed to load data: {e}")
-        return None
+        return None, None
 
-df = load_data()
+df, summary = load_data()
 if df is None:
     st.warning("No prediction data available. Run `python ml/predict.py` first.")
     st.stop()
@@ -154,21 +176,30 @@ if df is None:
 st.markdown('<p class="main-header">🚀 GitPulse</p>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Discover GitHub repos before they go viral</p>', unsafe_allow_html=True)
 
+def summary_count(label, threshold, fallback):
+    # exact count over every scored repo, precomputed by predict
+    if summary is None:
+        return fallback
+    return summary["counts"].get(label, {}).get(f"{threshold:.2f}", fallback)
+
+stars_limit = summary["max_stars"] if summary else int(df["stars"].max())
+forks_limit = summary["max_forks"] if summary else int(df["forks"].max())
+
 with st.sidebar:
     st.markdown("### Filters")
     
     min_stars, max_stars = st.slider(
         "Stars Range", 
         min_value=0, 
-        max_value=int(df["stars"].max()), 
-        value=(0, int(df["stars"].max()))
+        max_value=stars_limit, 
+        value=(0, stars_limit)
     )
     
     min_forks, max_forks = st.slider(
         "Forks Range", 
         min_value=0, 
-        max_value=int(df["forks"].max()), 
-        value=(0, int(df["forks"].max()))
+        max_value=forks_limit, 
+        value=(0, forks_limit)
     )
     
     prob_threshold = st.slider("Probability Threshold", 0.5, 0.99, 0.7)
@@ -186,12 +217,15 @@ filtered_df = df[
     (df["stars"] <= max_stars) &
     (df["forks"] >= min_forks) &
     (df["forks"] <= max_forks)
-].copy()
+]
 
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_analyzed = df["total_repos_analyzed"].iloc[0] if "total_repos_analyzed" in df.columns else len(df)
+    if summary:
+        total_analyzed = summary["total_repos_analyzed"]
+    else:
+        total_analyzed = df["total_repos_analyzed"].iloc[0] if "total_repos_analyzed" in df.columns else len(df)
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value">{total_analyzed:,}</div>
@@ -201,6 +235,9 @@ with col1:
 
 with col2:
     viral_count = len(filtered_df[filtered_df["viral_prob"] >= prob_threshold])
+    unfiltered = (min_stars, max_stars, min_forks, max_forks) == (0, stars_limit, 0, forks_limit)
+    if unfiltered:
+        viral_count = summary_count("viral_prob", prob_threshold, viral_count)
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-value" style="color: #ff6b6b;">{viral_count:,}</div>
@@ -210,7 +247,7 @@ with col2:
 
 with col3:
     if "trending_prob" in df.columns:
-        trending_count = len(df[df["trending_prob"] >= 0.7])
+        trending_count = summary_count("trending_prob", 0.7, len(df[df["trending_prob"] >= 0.7]))
     else:
         trending_count = 0
     st.markdown(f"""
@@ -222,7 +259,7 @@ with col3:
 
 with col4:
     if "trending_prob" in df.columns:
-        hot_count = len(df[(df["viral_prob"] >= 0.7) & (df["trending_prob"] >= 0.7)])
+        hot_count = summary_count("hot", 0.7, len(df[(df["viral_prob"] >= 0.7) & (df["trending_prob"] >= 0.7)]))
     else:
         hot_count = 0
     st.markdown(f"""
@@ -234,83 +271,111 @@ with col4:
 
 st.markdown("<br>", unsafe_allow_html=True)
 
-tab1, tab2, tab3 = st.tabs(["🔥 Viral", "📈 Trending", "⭐ Hot"])
+PAGE_SIZE = 48
+GRID_COLUMNS = 3
 
-def render_repo_card(row):
-    viral_pct = int(row["viral_prob"] * 100)
-    trending_pct = int(row.get("trending_prob", 0) * 100)
-    velocity = row.get("star_velocity", 0)
-    velocity_width = min(velocity * 10, 100)
+# kept flush-left: indented lines inside one markdown call would turn into code blocks
+CARD_TEMPLATE = """<div class="repo-card">
+<a href="https://github.com/{name}" target="_blank" class="repo-name">{name}</a>
+<div class="repo-stats">
+<span>⭐ {stars:,}</span>
+<span>🍴 {forks:,}</span>
+</div>
+<div style="display: flex; justify-content: space-between; align-items: center; margin-top: 0.5rem;">
+<span style="color: #888; font-size: 0.85rem;">Star Velocity</span>
+<span style="color: #fff; font-weight: 600;">{velocity:.1f}x normal</span>
+</div>
+<div class="velocity-bar">
+<div class="velocity-fill" style="width: {velocity_width}%;"></div>
+</div>
+<div style="display: flex; gap: 0.5rem; margin-top: 1rem;">
+<span class="prob-badge-viral">🔥 Viral {viral_pct}%</span>
+<span class="prob-badge-trending">📈 Trending {trending_pct}%</span>
+</div>
+</div>"""
+
+def column_or_zero(frame, column):
+    return frame[column].to_numpy() if column in frame.columns else np.zeros(len(frame))
+
+def render_repo_cards(frame):
+    # works on whole columns instead of iterrows, one HTML string per card
+    velocity = column_or_zero(frame, "star_velocity").astype(float)
+    return [
+        CARD_TEMPLATE.format(
+            name=name, stars=int(stars), forks=int(forks), velocity=vel,
+            velocity_width=width, viral_pct=int(viral), trending_pct=int(trending)
+        )
+        for name, stars, forks, vel, width, viral, trending in zip(
+            frame["repo_name"].to_numpy(),
+            frame["stars"].to_numpy(),
+            column_or_zero(frame, "forks"),
+            velocity,
+            np.minimum(velocity * 10, 100),
+            frame["viral_prob"].to_numpy() * 100,
+            column_or_zero(frame, "trending_prob") * 100,
+        )
+    ]
+
+def render_card_grid(frame, key, empty_message):
+    if len(frame) == 0:
+        st.info(empty_message)
+        return
     
-    card_html = f"""
-    <div class="repo-card">
-        <a href="https://github.com/{row['repo_name']}" target="_blank" class="repo-name">{row['repo_name']}</a>
-        <div class="repo-stats">
-            <span>⭐ {int(row['stars']):,}</span>
-            <span>🍴 {int(row.get('forks', 0)):,}</span>
-        </div>
-        <div style="display: flex; justify-content: space-between; align-items: center; margin-top: 0.5rem;">
-            <span style="color: #888; font-size: 0.85rem;">Star Velocity</span>
-            <span style="color: #fff; font-weight: 600;">{velocity:.1f}x normal</span>
-        </div>
-        <div class="velocity-bar">
-            <div class="velocity-fill" style="width: {velocity_width}%;"></div>
-        </div>
-        <div style="display: flex; gap: 0.5rem; margin-top: 1rem;">
-            <span class="prob-badge-viral">🔥 Viral {viral_pct}%</span>
-            <span class="prob-badge-trending">📈 Trending {trending_pct}%</span>
-        </div>
-    </div>
-    """
-    return card_html
+    pages = (len(frame) - 1) // PAGE_SIZE + 1
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page") if pages > 1 else 1
+    start = (page - 1) * PAGE_SIZE
+    cards = render_repo_cards(frame.iloc[start:start + PAGE_SIZE])
+    st.caption(f"Showing {start + 1}–{start + len(cards)} of {len(frame):,}")
+    
+    # one markdown element per grid column
+    for i, col in enumerate(st.columns(GRID_COLUMNS)):
+        with col:
+            st.markdown("\n".join(cards[i::GRID_COLUMNS]), unsafe_allow_html=True)
 
-with tab1:
+# only the selected view is filtered, sorted and rendered on each rerun
+view = st.radio("View", ["🔥 Viral", "📈 Trending", "⭐ Hot"], horizontal=True, label_visibility="collapsed")
+
+if view == "🔥 Viral":
     viral_df = filtered_df[filtered_df["viral_prob"] >= prob_threshold].sort_values(
         sort_map[sort_by], ascending=False
-    ).head(50)
-
-    
-    if len(viral_df) == 0:
-        st.info("No repos match the current filters.")
-    else:
-        cols = st.columns(3)
-        for idx, (_, row) in enumerate(viral_df.iterrows()):
-            with cols[idx % 3]:
-                st.markdown(render_repo_card(row), unsafe_allow_html=True)
+    )
+    render_card_grid(viral_df, "viral", "No repos match the current filters.")
 
-with tab2:
+elif view == "📈 Trending":
     if "trending_prob" in filtered_df.columns:
         trending_df = filtered_df[filtered_df["trending_prob"] >= prob_threshold].sort_values(
             "trending_prob", ascending=False
-        ).head(50)
-        
-        if len(trending_df) == 0:
-            st.info("No repos match the current filters.")
-        else:
-            cols = st.columns(3)
-            for idx, (_, row) in enumerate(trending_df.iterrows()):
-                with cols[idx % 3]:
-                    st.markdown(render_repo_card(row), unsafe_allow_html=True)
+        )
+        render_card_grid(trending_df, "trending", "No repos match the current filters.")
     else:
         st.info("Coming Soon.")
 
-with tab3:
+else:
     if "trending_prob" in filtered_df.columns:
         hot_df = filtered_df[
             (filtered_df["viral_prob"] >= prob_threshold) & 
             (filtered_df["trending_prob"] >= prob_threshold)
-        ].sort_values("viral_prob", ascending=False).head(50)
-        
-        if len(hot_df) == 0:
-            st.info("No repos are both viral and trending at current threshold.")
-        else:
-            cols = st.columns(3)
-            for idx, (_, row) in enumerate(hot_df.iterrows()):
-                with cols[idx % 3]:
-                    st.markdown(render_repo_card(row), unsafe_allow_html=True)
+        ].sort_values("viral_prob", ascending=False)
+        render_card_grid(hot_df, "hot", "No repos are both viral and trending at current threshold.")
     else:
         st.info("Coming Soon.")
 
+@st.cache_data(ttl=300)
+def load_history(repo_name):
+    # a handful of ranged reads through the gold row-group index, not a scan of every day
+    from ingest.history import find_repo_id, get_repo_history
+    repo_id = find_repo_id(repo_name)
+    return None if repo_id is None else get_repo_history(repo_id)
+
+with st.expander("📜 Repo history"):
+    history_repo = st.text_input("Repository (owner/name)", key="history_repo")
+    if history_repo:
+        history = load_history(history_repo.strip())
+        if history is None or len(history) == 0:
+            st.info(f"No gold history for {history_repo}.")
+        else:
+            st.line_chart(history.set_index("date")[["stars", "forks", "pushes"]])
+
 st.markdown("<br><br>", unsafe_allow_html=True)
 st.markdown(
     "<p style='text-align: center; color: #555;'>GitPulse • Predicting GitHub trends with ML • Updated daily</p>", 
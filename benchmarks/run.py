@@ -0,0 +1,195 @@
+import os
+import sys
+sys.path.append(".")
+
+import argparse
+import functools
+import json
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "ml"))
+
+from benchmarks.synthetic import ArchiveGenerator, date_range
+
+# Runs the pipeline end to end on synthetic GH Archive data. The archive is
+# served over HTTP from a local directory and R2 is replaced by the filesystem
+# backend (S3_BACKEND=local), so nothing leaves the machine. Every stage runs
+# in a fresh process, so the process peak RSS is that stage's own. It's read
+# through telemetry.peak_rss_mb, because telemetry resets ru_maxrss per stage.
+STAGES = ["ingest_hour", "process_day_to_silver", "process_day_to_gold",
+          "build_features", "make_predictions", "retrain"]
+
+def stage_ingest_hour(date):
+    from ingest.bronze import ingest_hour
+    from ingest.config import get_s3_client
+    from ingest.fetch import make_session
+    s3, session = get_s3_client(), make_session()
+    uploads = [ingest_hour(date, hour, session=session, s3=s3) for hour in range(24)]
+    return {"hours": len(uploads), "bytes_out": sum(upload["bytes"] for upload in uploads)}
+
+def stage_process_day_to_silver(date):
+    from ingest.silver import process_day_to_silver
+    from ingest.catalog import list_partitions
+    from ingest.config import get_s3_client
+    _, failed_hours = process_day_to_silver(date)
+    entry = list_partitions(get_s3_client(), "silver", "events.parquet")[date]
+    return {"rows_out": entry.get("rows"), "bytes_out": entry.get("bytes"), "failed_hours": failed_hours}
+
+def stage_process_day_to_gold(date):
+    from ingest.gold import process_day_to_gold
+    from ingest.catalog import list_partitions
+    from ingest.config import get_s3_client
+    process_day_to_gold(date)
+    entry = list_partitions(get_s3_client(), "gold", "metrics.parquet")[date]
+    return {"rows_out": entry.get("rows"), "bytes_out": entry.get("bytes")}
+
+def stage_build_features(date):
+    from predict import build_features
+    from ingest.config import get_s3_client
+    features = build_features(get_s3_client(), date)
+    return {"rows_out": len(features)}
+
+def stage_make_predictions(date):
+    from predict import make_predictions
+    from ingest.config import get_s3_client, R2_BUCKET
+    make_predictions()
+    response = get_s3_client().get_object(Bucket=R2_BUCKET, Key="predictions/summary.json")
+    return {"rows_out": json.loads(response["Body"].read())["total_repos_analyzed"]}
+
+def stage_retrain(date, tournament=False):
+    from retrain import retrain
+    retrain(tournament=tournament)
+    return {}
+
+def run_stage(name, date, kwargs):
+    from ingest.telemetry import peak_rss_mb
+    started = time.perf_counter()
+    extra = globals()[f"stage_{name}"](date, **kwargs)
+    return {
+        "stage": name,
+        "date": date,
+        "seconds": time.perf_counter() - started,
+        "peak_rss_mb": peak_rss_mb(),
+        **extra,
+    }
+
+def measure(name, date, **kwargs):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+        result = pool.submit(run_stage, name, date, kwargs).result()
+    print(f"[bench] {name} {date}: {result['seconds']:.2f}s, peak {result['peak_rss_mb']:.0f} MB")
+    return result
+
+def serve_directory(path):
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=path))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def summarize(runs):
+    stages = {}
+    for run in runs:
+        stage = stages.setdefault(run["stage"], {"runs": 0, "seconds_total": 0.0, "seconds_max": 0.0,
+                                                 "peak_rss_mb_max": 0.0, "rows_out": 0, "bytes_out": 0})
+        stage["runs"] += 1
+        stage["seconds_total"] += run["seconds"]
+        stage["seconds_max"] = max(stage["seconds_max"], run["seconds"])
+        stage["peak_rss_mb_max"] = max(stage["peak_rss_mb_max"], run["peak_rss_mb"])
+        stage["rows_out"] += run.get("rows_out") or 0
+        stage["bytes_out"] += run.get("bytes_out") or 0
+    for stage in stages.values():
+        stage["seconds_mean"] = stage["seconds_total"] / stage["runs"]
+    return stages
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "commit": commit}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data")
+    parser.add_argument("--days", type=int, default=10,
+                        help="Days to generate and ingest (retrain needs at least 10)")
+    parser.add_argument("--events-per-hour", type=int, default=20000)
+    parser.add_argument("--repos", type=int, default=50000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--churn", type=float, default=0.05)
+    parser.add_argument("--payload-bytes", type=int, default=1500)
+    parser.add_argument("--mix", default=None, help="JSON object of event type -> share")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--tournament", action="store_true", help="Benchmark retrain --tournament")
+    parser.add_argument("--workdir", default=None, help="Keep generated data here (default: temp dir)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="gitpulse-bench-")
+    archive_dir = os.path.join(workdir, "gharchive")
+    # make_predictions scores yesterday, so the synthetic days end there
+    end = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+    dates = date_range(end, args.days)
+
+    print(f"Generating {len(dates)} days in {archive_dir}")
+    generator = ArchiveGenerator(args.repos, events_per_hour=args.events_per_hour, skew=args.skew,
+                                 churn=args.churn, payload_bytes=args.payload_bytes,
+                                 mix=json.loads(args.mix) if args.mix else None, seed=args.seed)
+    started = time.perf_counter()
+    archive_bytes = sum(generator.write_day(archive_dir, date) for date in dates)
+    generate_seconds = time.perf_counter() - started
+
+    server = serve_directory(archive_dir)
+    # inherited by every stage process
+    os.environ.update({
+        "S3_BACKEND": "local",
+        "LOCAL_S3_DIR": os.path.join(workdir, "s3"),
+        "R2_BUCKET_NAME": "gitpulse-bench",
+        "GHARCHIVE_URL": f"http://127.0.0.1:{server.server_address[1]}",
+        "KEEP_BRONZE": "true",
+        "PARTITION_CACHE_DIR": os.path.join(workdir, "partition_cache"),
+        "MODEL_CACHE_DIR": os.path.join(workdir, "model_cache"),
+        "FEATURE_STORE_DIR": os.path.join(workdir, "feature_store"),
+    })
+
+    runs = []
+    for date in dates:
+        for name in ["ingest_hour", "process_day_to_silver", "process_day_to_gold"]:
+            if name in args.stages:
+                runs.append(measure(name, date))
+    for name in ["build_features", "make_predictions"]:
+        if name in args.stages:
+            runs.append(measure(name, dates[-1]))
+    if "retrain" in args.stages:
+        runs.append(measure("retrain", dates[-1], tournament=args.tournament))
+    server.shutdown()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "config": {**vars(args), "workdir": workdir, "dates": dates},
+        "archive": {"bytes": archive_bytes, "events": args.events_per_hour * 24 * len(dates),
+                    "generate_seconds": generate_seconds},
+        "stages": summarize(runs),
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
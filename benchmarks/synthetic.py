@@ -0,0 +1,121 @@
+import sys
+sys.path.append(".")
+
+import argparse
+import gzip
+import json
+import os
+import numpy as np
+from datetime import datetime, timedelta
+
+# Rough share of each event type in a GH Archive hour. Only the types gold
+# counts matter to the pipeline; the rest exercise the silver prefilter.
+DEFAULT_MIX = {
+    "PushEvent": 0.52,
+    "CreateEvent": 0.14,
+    "PullRequestEvent": 0.08,
+    "WatchEvent": 0.07,
+    "IssueCommentEvent": 0.06,
+    "DeleteEvent": 0.03,
+    "PullRequestReviewEvent": 0.03,
+    "IssuesEvent": 0.02,
+    "ForkEvent": 0.015,
+    "ReleaseEvent": 0.01,
+    "PullRequestReviewCommentEvent": 0.01,
+    "GollumEvent": 0.005,
+    "MemberEvent": 0.005,
+    "PublicEvent": 0.005,
+}
+
+class ArchiveGenerator:
+    # Hourly .json.gz files shaped like data.gharchive.org's. Repo activity is
+    # Zipf-distributed (skew is the exponent). Each day a churn fraction of the
+    # ranks is reshuffled, so repos rise and fall and some become viral.
+    # payload_bytes pads each payload to get GH Archive-like line sizes
+    # (real lines average a few KB).
+    def __init__(self, repos=50000, actors=200000, events_per_hour=20000, skew=1.1,
+                 churn=0.05, payload_bytes=1500, mix=None, seed=42):
+        self.repos = repos
+        self.actors = actors
+        self.events_per_hour = events_per_hour
+        self.churn = churn
+        self.payload_bytes = payload_bytes
+        self.rng = np.random.default_rng(seed)
+        mix = mix or DEFAULT_MIX
+        self.types = list(mix)
+        self.type_p = np.array([mix[t] for t in self.types], dtype=np.float64)
+        self.type_p /= self.type_p.sum()
+        weights = 1.0 / np.arange(1, repos + 1) ** skew
+        self.rank_p = weights / weights.sum()
+        self.ranking = self.rng.permutation(repos)
+        self.day = None
+
+    def _start_day(self, date):
+        if self.day is not None and self.day != date:
+            moved = self.rng.choice(self.repos, int(self.repos * self.churn), replace=False)
+            self.ranking[moved] = self.ranking[self.rng.permutation(moved)]
+        self.day = date
+
+    def hour_lines(self, date, hour):
+        self._start_day(date)
+        n = self.events_per_hour
+        repo_ids = self.ranking[self.rng.choice(self.repos, n, p=self.rank_p)] + 1
+        actor_ids = self.rng.integers(1, self.actors + 1, n)
+        type_codes = self.rng.choice(len(self.types), n, p=self.type_p)
+        seconds = np.sort(self.rng.integers(0, 3600, n))
+        padding = "x" * self.payload_bytes
+        base = datetime.strptime(date, "%Y-%m-%d") + timedelta(hours=hour)
+        for i in range(n):
+            created_at = (base + timedelta(seconds=int(seconds[i]))).strftime("%Y-%m-%dT%H:%M:%SZ")
+            repo_id = int(repo_ids[i])
+            event = {
+                "id": str(self.rng.integers(10 ** 10, 10 ** 11)),
+                "type": self.types[type_codes[i]],
+                "actor": {"id": int(actor_ids[i]), "login": f"user{actor_ids[i]}"},
+                "repo": {"id": repo_id, "name": f"owner{repo_id % 9973}/repo{repo_id}",
+                         "url": f"https://api.github.com/repos/owner{repo_id % 9973}/repo{repo_id}"},
+                "payload": {"action": "started", "body": padding},
+                "public": True,
+                "created_at": created_at,
+            }
+            yield json.dumps(event, separators=(",", ":"))
+
+    def hour_bytes(self, date, hour):
+        return gzip.compress(("\n".join(self.hour_lines(date, hour)) + "\n").encode(), compresslevel=6)
+
+    def write_day(self, out_dir, date):
+        # files are named like the real archive: 2026-01-01-0.json.gz (hour not padded)
+        os.makedirs(out_dir, exist_ok=True)
+        total = 0
+        for hour in range(24):
+            path = os.path.join(out_dir, f"{date}-{hour}.json.gz")
+            data = self.hour_bytes(date, hour)
+            with open(path, "wb") as f:
+                f.write(data)
+            total += len(data)
+        return total
+
+def date_range(end_date, days):
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    return [(end - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days - 1, -1, -1)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic GH Archive hours")
+    parser.add_argument("--out", required=True, help="Directory for the .json.gz files")
+    parser.add_argument("--end", required=True, help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--events-per-hour", type=int, default=20000)
+    parser.add_argument("--repos", type=int, default=50000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--churn", type=float, default=0.05)
+    parser.add_argument("--payload-bytes", type=int, default=1500)
+    parser.add_argument("--mix", default=None, help="JSON object of event type -> share")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generator = ArchiveGenerator(args.repos, events_per_hour=args.events_per_hour, skew=args.skew,
+                                 churn=args.churn, payload_bytes=args.payload_bytes,
+                                 mix=json.loads(args.mix) if args.mix else None, seed=args.seed)
+    for date in date_range(args.end, args.days):
+        size = generator.write_day(args.out, date)
+        print(f"{date}: {size / 1024 ** 2:.1f} MB")
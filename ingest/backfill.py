@@ -1,31 +1,87 @@
 import sys
 sys.path.append(".")
 
-from datetime import datetime, timedelta, timezone
-from ingest.bronze import ingest_hour, delete_bronze_day
-from ingest.silver import process_day_to_silver, delete_silver_day
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from ingest.fetch import fetch_day
+from ingest.silver import process_day_to_silver, process_day_direct_to_silver, delete_silver_day
 from ingest.gold import process_day_to_gold
+from ingest.config import KEEP_BRONZE, FETCH_WORKERS
 
-start_date = datetime(2026, 1, 1)
-end_date = datetime(2026, 1, 10)
-
-current = start_date
-while current <= end_date:
-    date_str = current.strftime("%Y-%m-%d")
+def process_day(date_str, hour_workers=FETCH_WORKERS):
     print(f"\n=== Processing {date_str} ===")
-    
-    for hour in range(24):
-        try:
-            ingest_hour(date_str, hour)
-            print(f"Downloaded: hour {hour}")
-        except Exception as e:
-            print(f"Failed hour {hour}: {e}")
-    
-    process_day_to_silver(date_str)
+    if KEEP_BRONZE:
+        fetch_day(date_str, workers=hour_workers)
+        _, failed_hours = process_day_to_silver(date_str)
+    else:
+        _, failed_hours = process_day_direct_to_silver(date_str, workers=hour_workers)
     process_day_to_gold(date_str)
-    delete_bronze_day(date_str)
     delete_silver_day(date_str)
+    return failed_hours
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"completed": {}, "failed": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(checkpoint, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def days_to_run(start, end, checkpoint, retry_partial=False):
+    days = []
+    current = start
+    while current <= end:
+        date_str = current.strftime("%Y-%m-%d")
+        done = checkpoint["completed"].get(date_str)
+        if done is None or (retry_partial and done["failed_hours"]):
+            days.append(date_str)
+        current += timedelta(days=1)
+    return days
+
+def backfill(start, end, workers=2, hour_workers=FETCH_WORKERS,
+             checkpoint_path="backfill_checkpoint.json", retry_partial=False):
+    checkpoint = load_checkpoint(checkpoint_path)
+    days = days_to_run(start, end, checkpoint, retry_partial)
+    print(f"{len(days)} days to process, {len(checkpoint['completed'])} already in {checkpoint_path}")
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_day, date_str, hour_workers): date_str for date_str in days}
+        for future in as_completed(futures):
+            date_str = futures[future]
+            try:
+                failed_hours = future.result()
+                checkpoint["completed"][date_str] = {"failed_hours": failed_hours}
+                checkpoint["failed"].pop(date_str, None)
+                print(f"Finished {date_str}" + (f" (missing hours {failed_hours})" if failed_hours else ""))
+            except Exception as e:
+                checkpoint["failed"][date_str] = str(e)
+                print(f"Failed {date_str}: {e}")
+            save_checkpoint(checkpoint, checkpoint_path)
     
-    current += timedelta(days=1)
+    return checkpoint
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
 
-print("\nDone!")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill gold partitions for a date range")
+    parser.add_argument("--start", type=parse_date, required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=parse_date, required=True, help="last day (inclusive), YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="days processed in parallel")
+    parser.add_argument("--hour-workers", type=int, default=FETCH_WORKERS, help="concurrent hour downloads per day")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="file recording finished days")
+    parser.add_argument("--retry-partial", action="store_true", help="reprocess days that finished with failed hours")
+    args = parser.parse_args()
+    
+    checkpoint = backfill(args.start, args.end, args.workers, args.hour_workers, args.checkpoint, args.retry_partial)
+    
+    if checkpoint["failed"]:
+        print(f"\nFailed days (rerun to resume): {sorted(checkpoint['failed'])}")
+    print("\nDone!")
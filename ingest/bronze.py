@@ -2,36 +2,108 @@ import requests
 import gzip
 from datetime import datetime, timedelta
 import sys
-from .config import get_s3_client, R2_BUCKET
+from .config import get_s3_client, R2_BUCKET, MULTIPART_PART_SIZE, DOWNLOAD_CHUNK_SIZE, GHARCHIVE_URL
+from .catalog import update_catalog, load_catalog, remove_partitions
+from .storage import bronze_key, delete_keys
+from .telemetry import timed
 
-def download_hour(date, hour):
-    url = f"https://data.gharchive.org/{date}-{hour}.json.gz"
-    response = requests.get(url)
+@timed("download_hour", keep=("date", "hour"), bytes_in=len)
+def download_hour(date, hour, session=None):
+    url = f"{GHARCHIVE_URL}/{date}-{hour}.json.gz"
+    response = (session or requests).get(url, timeout=60)
     response.raise_for_status()
     return response.content
 
-def upload_to_bronze(data, date, hour):
-    s3 = get_s3_client()
-    year, month, day = date.split("-")
-    key = f"bronze/year={year}/month={month}/day={day}/hour={hour:02d}/events.json.gz"
-    s3.put_object(Bucket=R2_BUCKET, Key=key, Body=data)
-    return key
+def open_hour(date, hour, session=None):
+    url = f"{GHARCHIVE_URL}/{date}-{hour}.json.gz"
+    response = (session or requests).get(url, stream=True, timeout=60)
+    response.raise_for_status()
+    # keep the body gzipped even if the server labels it Content-Encoding: gzip
+    response.raw.decode_content = False
+    return response
+
+def stream_hour(date, hour, session=None):
+    return open_hour(date, hour, session).iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+
+@timed("upload_to_bronze", keep=("date", "hour"), bytes_out=lambda entry: entry["bytes"])
+def upload_to_bronze(data, date, hour, s3=None):
+    s3 = s3 or get_s3_client()
+    key = bronze_key(date, hour)
+    response = s3.put_object(Bucket=R2_BUCKET, Key=key, Body=data)
+    return {"key": key, "bytes": len(data), "etag": response["ETag"]}
+
+@timed("upload_stream_to_bronze", keep=("date", "hour"), bytes_out=lambda entry: entry["bytes"])
+def upload_stream_to_bronze(chunks, date, hour, s3=None):
+    # Only ever holds about one part in memory. Hours smaller than a single
+    # part skip the multipart dance and go up with a plain put_object.
+    s3 = s3 or get_s3_client()
+    key = bronze_key(date, hour)
+    
+    buffer = bytearray()
+    upload_id = None
+    parts = []
+    size = 0
+    try:
+        for chunk in chunks:
+            buffer.extend(chunk)
+            size += len(chunk)
+            while len(buffer) >= MULTIPART_PART_SIZE:
+                if upload_id is None:
+                    upload_id = s3.create_multipart_upload(Bucket=R2_BUCKET, Key=key)["UploadId"]
+                part = bytes(buffer[:MULTIPART_PART_SIZE])
+                del buffer[:MULTIPART_PART_SIZE]
+                response = s3.upload_part(
+                    Bucket=R2_BUCKET, Key=key, UploadId=upload_id,
+                    PartNumber=len(parts) + 1, Body=part
+                )
+                parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+        
+        if upload_id is None:
+            response = s3.put_object(Bucket=R2_BUCKET, Key=key, Body=bytes(buffer))
+            return {"key": key, "bytes": size, "etag": response["ETag"]}
+        
+        if buffer:
+            response = s3.upload_part(
+                Bucket=R2_BUCKET, Key=key, UploadId=upload_id,
+                PartNumber=len(parts) + 1, Body=bytes(buffer)
+            )
+            parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+        
+        response = s3.complete_multipart_upload(
+            Bucket=R2_BUCKET, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        if upload_id is not None:
+            s3.abort_multipart_upload(Bucket=R2_BUCKET, Key=key, UploadId=upload_id)
+        raise
+    return {"key": key, "bytes": size, "etag": response["ETag"]}
+
+def ingest_hour(date, hour, stream=True, session=None, s3=None):
+    if stream:
+        return upload_stream_to_bronze(stream_hour(date, hour, session), date, hour, s3)
+    data = download_hour(date, hour, session)
+    return upload_to_bronze(data, date, hour, s3)
 
-def ingest_hour(date, hour):
-    data = download_hour(date, hour)
-    key = upload_to_bronze(data, date, hour)
-    return key
+def record_bronze_day(s3, date, uploads):
+    # uploads maps hour -> the entry returned by ingest_hour
+    def update(catalog):
+        hours = catalog["partitions"].setdefault(date, {"hours": {}})["hours"]
+        for hour, entry in uploads.items():
+            hours[f"{hour:02d}"] = entry
+    update_catalog(s3, "bronze", update)
 
 def delete_bronze_day(date):
     s3 = get_s3_client()
-    year, month, day = date.split("-")
     
-    for hour in range(24):
-        key = f"bronze/year={year}/month={month}/day={day}/hour={hour:02d}/events.json.gz"
-        try:
-            s3.delete_object(Bucket=R2_BUCKET, Key=key)
-        except:
-            pass
+    catalog, _ = load_catalog(s3, "bronze")
+    entry = (catalog or {"partitions": {}})["partitions"].get(date)
+    if entry:
+        keys = [hour["key"] for hour in entry["hours"].values()]
+    else:
+        keys = [bronze_key(date, hour) for hour in range(24)]
+    delete_keys(s3, keys)
+    remove_partitions(s3, "bronze", [date])
     print(f"Deleted bronze for {date}")
     
 if __name__ == "__main__":
@@ -39,5 +111,5 @@ if __name__ == "__main__":
     date = yesterday.strftime("%Y-%m-%d")
     hour = 12
     
-    key = ingest_hour(date, hour)
-    print(f"Uploaded: {key}")
+    entry = ingest_hour(date, hour)
+    print(f"Uploaded: {entry['key']}")
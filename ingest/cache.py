@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from .config import R2_BUCKET, CACHE_DIR, CACHE_MAX_BYTES, FETCH_WORKERS
+from .layout import matching_row_groups, filter_repos
+
+def read_parquet_bytes(data, columns=None, repo_ids=None):
+    return read_parquet(BytesIO(data), columns, repo_ids)
+
+def read_parquet(source, columns=None, repo_ids=None):
+    # with repo_ids, row groups whose repo_id statistics rule them out are never decoded
+    parquet = pq.ParquetFile(source)
+    if repo_ids is None:
+        table = parquet.read(columns=columns)
+    else:
+        read_columns = columns if columns is None or "repo_id" in columns else list(columns) + ["repo_id"]
+        table = parquet.read_row_groups(matching_row_groups(parquet.metadata, repo_ids), columns=read_columns)
+        table = filter_repos(table, repo_ids)
+        table = table.select(columns) if columns else table
+    # Parquet file metadata (e.g. silver's failed_hours) rides along on the schema
+    return table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        **(parquet.metadata.metadata or {}),
+    })
+
+class PartitionCache:
+    # Local copy of silver/gold partitions. Each object is stored as an
+    # uncompressed Arrow IPC file (memory-mapped on read) next to a small JSON
+    # sidecar holding its ETag. A read of some columns caches only those
+    # columns, as a separate entry from the full object. Every read is a conditional GET, so a hit costs
+    # one 304 response and no body. The file mtime is the LRU clock; the cache
+    # lives entirely in the filesystem, so several processes can share it.
+    def __init__(self, path=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _paths(self, key, columns=None):
+        name = key if columns is None else f"{key}|{','.join(columns)}"
+        name = hashlib.sha1(name.encode()).hexdigest()
+        base = os.path.join(self.path, name)
+        return f"{base}.arrow", f"{base}.json"
+
+    def _read(self, data_path):
+        source = pa.memory_map(data_path)
+        table = pa.ipc.open_file(source).read_all()
+        os.utime(data_path)
+        return table
+
+    def get_table(self, s3, key, columns=None):
+        data_path, meta_path = self._paths(key, columns)
+        etag = None
+        if os.path.exists(data_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                etag = json.load(f)["etag"]
+
+        try:
+            if etag:
+                response = s3.get_object(Bucket=R2_BUCKET, Key=key, IfNoneMatch=etag)
+            else:
+                response = s3.get_object(Bucket=R2_BUCKET, Key=key)
+        except ClientError as e:
+            if etag and e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+                return self._read(data_path)
+            raise
+
+        table = read_parquet_bytes(response["Body"].read(), columns)
+        self._store(table, data_path, meta_path, key, response["ETag"])
+        return table
+
+    def _store(self, table, data_path, meta_path, key, etag):
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(f"{data_path}.{suffix}", "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{data_path}.{suffix}", data_path)
+        with open(f"{meta_path}.{suffix}", "w") as f:
+            json.dump({"key": key, "etag": etag}, f)
+        os.replace(f"{meta_path}.{suffix}", meta_path)
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.path):
+                if name.endswith(".arrow"):
+                    stat = os.stat(os.path.join(self.path, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                base = os.path.join(self.path, name[:-len(".arrow")])
+                for path in (f"{base}.arrow", f"{base}.json"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = PartitionCache()
+    return _cache
+
+def open_object(s3, key):
+    # uncached, seekable source for pq.ParquetFile
+    local_path = getattr(s3, "local_path", None)
+    if local_path is not None:
+        return pa.memory_map(local_path(R2_BUCKET, key))
+    response = s3.get_object(Bucket=R2_BUCKET, Key=key)
+    return BytesIO(response["Body"].read())
+
+def read_partition(s3, key, columns=None, cache=True, repo_ids=None):
+    # repo_ids limits the result to those repos
+    local_path = getattr(s3, "local_path", None)
+    if local_path is not None:
+        # the filesystem backend's objects are already on local disk; map them
+        # in place instead of copying them into the cache
+        return read_parquet(open_object(s3, key), columns, repo_ids)
+    if cache:
+        read_columns = columns if columns is None or repo_ids is None or "repo_id" in columns else list(columns) + ["repo_id"]
+        table = get_cache().get_table(s3, key, read_columns)
+        if repo_ids is None:
+            return table
+        table = filter_repos(table, repo_ids)
+        return table.select(columns) if columns else table
+    return read_parquet(open_object(s3, key), columns, repo_ids)
+
+def read_partitions(s3, keys, columns=None, workers=FETCH_WORKERS, repo_ids=None):
+    # Fetches several partitions concurrently; missing ones map to None. Any
+    # other failure is raised, so callers never mistake it for a day with no data.
+    def read(key):
+        try:
+            return read_partition(s3, key, columns, repo_ids=repo_ids)
+        except FileNotFoundError:
+            # filesystem backend
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(keys, pool.map(read, keys)))
@@ -0,0 +1,86 @@
+import json
+import threading
+from botocore.exceptions import ClientError
+from .config import R2_BUCKET
+from .storage import parse_partition_key
+
+# One JSON object per layer listing its partitions, so readers find every date
+# with a single GET instead of paging through list_objects_v2:
+#   {"partitions": {"2026-01-01": {"key": ..., "rows": ..., "bytes": ..., "etag": ...}}}
+# Bronze entries hold per-hour objects under "hours" instead of a single key.
+# Updates are read-modify-write guarded by If-Match on the catalog's ETag, so
+# concurrent writers (backfill processes) retry instead of losing entries.
+CATALOG_KEY = "{layer}/_catalog.json"
+
+_lock = threading.Lock()
+
+def load_json(s3, key):
+    try:
+        response = s3.get_object(Bucket=R2_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.loads(response["Body"].read()), response["ETag"]
+
+def update_json(s3, key, update, empty, retries=10):
+    # update(doc) edits the dict in place; it may run more than once on conflicts
+    with _lock:
+        for attempt in range(retries):
+            doc, etag = load_json(s3, key)
+            if doc is None:
+                doc = empty()
+            update(doc)
+            body = json.dumps(doc, sort_keys=True).encode()
+            condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+            try:
+                s3.put_object(Bucket=R2_BUCKET, Key=key, Body=body, ContentType="application/json", **condition)
+                return doc
+            except ClientError as e:
+                status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+                if status not in (409, 412):
+                    raise
+        raise RuntimeError(f"Could not update {key} after {retries} attempts")
+
+def load_catalog(s3, layer):
+    return load_json(s3, CATALOG_KEY.format(layer=layer))
+
+def update_catalog(s3, layer, update, retries=10):
+    return update_json(s3, CATALOG_KEY.format(layer=layer), update, lambda: {"partitions": {}}, retries)
+
+def record_partition(s3, layer, date, entry):
+    def update(catalog):
+        catalog["partitions"][date] = entry
+    update_catalog(s3, layer, update)
+
+def remove_partitions(s3, layer, dates):
+    def update(catalog):
+        for date in dates:
+            catalog["partitions"].pop(date, None)
+    update_catalog(s3, layer, update)
+
+def rebuild_catalog(s3, layer, suffix):
+    # One-off migration for data written before the catalog existed: pages
+    # through every object in the layer and writes the catalog from the listing
+    partitions = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=R2_BUCKET, Prefix=f"{layer}/year="):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith(suffix):
+                continue
+            date, hour = parse_partition_key(obj["Key"])
+            entry = {"key": obj["Key"], "rows": None, "bytes": obj["Size"], "etag": obj["ETag"]}
+            if layer == "bronze":
+                partitions.setdefault(date, {"hours": {}})["hours"][f"{hour:02d}"] = entry
+            else:
+                partitions[date] = entry
+
+    def update(catalog):
+        catalog["partitions"] = {**partitions, **catalog["partitions"]}
+    return update_catalog(s3, layer, update)
+
+def list_partitions(s3, layer, suffix):
+    catalog, _ = load_catalog(s3, layer)
+    if catalog is None:
+        catalog = rebuild_catalog(s3, layer, suffix)
+    return catalog["partitions"]
@@ -1,15 +1,51 @@
-import boto3
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 R2_BUCKET = os.getenv("R2_BUCKET_NAME")
+# S3_BACKEND=local swaps R2 for a directory (ingest/local_s3.py), e.g. for benchmarks
+S3_BACKEND = os.getenv("S3_BACKEND", "r2")
+LOCAL_S3_DIR = os.getenv("LOCAL_S3_DIR", "local_s3")
+# one pooled client per process serves every thread, so size it for the busiest stage
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+GHARCHIVE_URL = os.getenv("GHARCHIVE_URL", "https://data.gharchive.org").rstrip("/")
+
+# S3/R2 multipart parts must be at least 5 MB, and R2 wants every part but the last to be the same size
+MULTIPART_PART_SIZE = int(os.getenv("MULTIPART_PART_SIZE", 8 * 1024 * 1024))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+# silver files are spooled in memory up to this size, then spill to a temp file
+SILVER_SPOOL_BYTES = int(os.getenv("SILVER_SPOOL_BYTES", 64 * 1024 * 1024))
+
+# Parquet layout (ingest/layout.py): gold row groups are small enough that a
+# per-repo lookup only decodes a sliver of the day
+PARQUET_ZSTD_LEVEL = int(os.getenv("PARQUET_ZSTD_LEVEL", 3))
+GOLD_ROW_GROUP_ROWS = int(os.getenv("GOLD_ROW_GROUP_ROWS", 16384))
+
+# Bronze is opt-in: by default hours are parsed straight from GH Archive into silver
+KEEP_BRONZE = os.getenv("KEEP_BRONZE", "false").lower() in ("1", "true", "yes")
+
+# local cache of gold/silver partitions, validated by ETag and LRU-evicted past the size limit
+CACHE_DIR = os.getenv("PARTITION_CACHE_DIR", os.path.expanduser("~/.cache/gitpulse/partitions"))
+CACHE_MAX_BYTES = int(os.getenv("PARTITION_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# model artifacts from the R2 registry, stored by content hash so they never need revalidating
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.expanduser("~/.cache/gitpulse/models"))
+
+# PIPELINE_PROFILE=1 adds cProfile + tracemalloc snapshots to every telemetry stage
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# hourly mode: GH Archive publishes an hour a few minutes after it ends; a day
+# missing hours is finalized into gold this long after it ends anyway
+PUBLISH_DELAY_MINUTES = int(os.getenv("PUBLISH_DELAY_MINUTES", 15))
+FINALIZE_AFTER_HOURS = int(os.getenv("FINALIZE_AFTER_HOURS", 6))
+
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 8))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", 3))
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", 2.0))
 
 def get_s3_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=os.getenv("R2_ENDPOINT_URL"),
-        aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY"),
-    )
\ No newline at end of file
+    # the process-wide pooled client from ingest/storage.py
+    from .storage import get_client
+    return get_client()
+
@@ -2,10 +2,12 @@ import sys
 sys.path.append(".")
 
 from datetime import datetime, timedelta, timezone
-from ingest.bronze import ingest_hour, delete_bronze_day
-from ingest.silver import process_day_to_silver, delete_silver_day
+from ingest.fetch import fetch_day
+from ingest.silver import process_day_to_silver, process_day_direct_to_silver, delete_silver_day
 from ingest.gold import process_day_to_gold
-from ingest.config import get_s3_client, R2_BUCKET
+from ingest.catalog import load_catalog
+from ingest.config import get_s3_client, R2_BUCKET, KEEP_BRONZE
+from ingest.telemetry import write_report
 
 s3 = get_s3_client()
 
@@ -14,15 +16,18 @@ yesterday_str = yesterday.strftime("%Y-%m-%d")
 
 print(f"\n=== Processing {yesterday_str} ===")
 
-for hour in range(24):
-    try:
-        ingest_hour(yesterday_str, hour)
-        print(f"Downloaded: hour {hour}")
-    except Exception as e:
-        print(f"Failed hour {hour}: {e}")
-process_day_to_silver(yesterday_str)
-process_day_to_gold(yesterday_str)
-delete_bronze_day(yesterday_str)
-delete_silver_day(yesterday_str)
+# the hourly pipeline finalizes gold itself; only ingest the day if it hasn't
+gold_catalog, _ = load_catalog(s3, "gold")
+if gold_catalog and yesterday_str in gold_catalog["partitions"]:
+    print(f"{yesterday_str} is already in gold")
+else:
+    if KEEP_BRONZE:
+        downloaded, failed = fetch_day(yesterday_str, s3=s3)
+        process_day_to_silver(yesterday_str)
+    else:
+        process_day_direct_to_silver(yesterday_str)
+    process_day_to_gold(yesterday_str)
+    delete_silver_day(yesterday_str)
 
-print("\nDaily ingest complete!")
\ No newline at end of file
+print("\nDaily ingest complete!")
+write_report(s3, "daily_ingest")
\ No newline at end of file
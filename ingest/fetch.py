@@ -0,0 +1,80 @@
+import http.client
+import random
+import time
+import zlib
+import requests
+import urllib3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from botocore.exceptions import ClientError, BotoCoreError
+from .bronze import ingest_hour, record_bronze_day
+from .config import get_s3_client, FETCH_WORKERS, FETCH_RETRIES, FETCH_BACKOFF
+
+def make_session(pool_size=FETCH_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def is_transient(error):
+    # 404 means the hour isn't published (yet), retrying won't help
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status == 429 or status >= 500
+    if isinstance(error, requests.RequestException):
+        return True
+    # The direct-to-silver path reads the raw urllib3 stream through gzip, so a
+    # connection dropped mid-hour surfaces as these instead of a requests error
+    if isinstance(error, (urllib3.exceptions.HTTPError, http.client.IncompleteRead, ConnectionError,
+                          EOFError, zlib.error)):
+        return True
+    if isinstance(error, ClientError):
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return status == 429 or status >= 500
+    return isinstance(error, BotoCoreError)
+
+def with_retries(fn, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            # full jitter so 24 hours failing together don't retry in lockstep
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+def fetch_hours(date, hours=range(24), workers=FETCH_WORKERS, retries=FETCH_RETRIES,
+                session=None, s3=None, task=ingest_hour, on_done=None):
+    # on_done(hour, result) runs on the calling thread as each hour finishes and
+    # its return value is kept instead of the result, so callers can consume
+    # large results one at a time
+    session = session or make_session(workers)
+    s3 = s3 or get_s3_client()
+    
+    done, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(with_retries, lambda h=hour: task(date, h, session=session, s3=s3), retries): hour
+            for hour in hours
+        }
+        for future in as_completed(futures):
+            hour = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed[hour] = str(e)
+                print(f"Failed hour {hour}: {e}")
+                continue
+            done[hour] = on_done(hour, result) if on_done else result
+            print(f"Downloaded: hour {hour}")
+    return done, failed
+
+def fetch_day(date, workers=FETCH_WORKERS, retries=FETCH_RETRIES, session=None, s3=None):
+    s3 = s3 or get_s3_client()
+    done, failed = fetch_hours(date, range(24), workers, retries, session, s3)
+    if done:
+        record_bronze_day(s3, date, done)
+    if failed:
+        print(f"{date}: {len(failed)} hours still failed after retries: {sorted(failed)}")
+    return done, failed
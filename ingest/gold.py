@@ -1,43 +1,131 @@
+import json
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from io import BytesIO
 from .config import get_s3_client, R2_BUCKET
+from .cache import open_object
+from .catalog import record_partition
+from .storage import silver_key, gold_key
+from .layout import write_parquet
+from .history import build_gold_index
+from .telemetry import stage, timed
 
-def load_silver_day(s3, date):
-    year, month, day = date.split("-")
-    key = f"silver/year={year}/month={month}/day={day}/events.parquet"
-    response = s3.get_object(Bucket=R2_BUCKET, Key=key)
-    return pd.read_parquet(BytesIO(response["Body"].read()))
+# gold column -> silver event type it counts; add an entry to count another type
+GOLD_COUNTS = {
+    "stars": "WatchEvent",
+    "forks": "ForkEvent",
+    "pushes": "PushEvent",
+    "prs": "PullRequestEvent",
+    "issues": "IssuesEvent",
+}
+
+METRICS_SCHEMA = pa.schema(
+    [("repo_id", pa.int64()), ("repo_name", pa.string())] + [(column, pa.int64()) for column in GOLD_COUNTS]
+)
+
+def load_silver_day(s3, date, columns=None):
+    # Silver's row groups are hours in the order they finished downloading and
+    # its "hours" metadata lists them, so they're read back in hour order and
+    # the first repo_name per repo doesn't depend on download timing. Not
+    # cached: gold reads each silver day once, just before it's deleted.
+    parquet = pq.ParquetFile(open_object(s3, silver_key(date)))
+    metadata = parquet.metadata.metadata or {}
+    hours = json.loads(metadata.get(b"hours", b"[]"))
+    groups = list(range(parquet.num_row_groups))
+    if len(hours) == len(groups):
+        groups.sort(key=lambda group: hours[group])
+    table = parquet.read_row_groups(groups, columns=columns)
+    # silver's file metadata (failed_hours) stays on the table so gold can see partial days
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
 
 def build_daily_metrics(df):
-    watch = df[df["event_type"] == "WatchEvent"].groupby("repo_id").size().rename("stars")
-    fork = df[df["event_type"] == "ForkEvent"].groupby("repo_id").size().rename("forks")
-    push = df[df["event_type"] == "PushEvent"].groupby("repo_id").size().rename("pushes")
-    pr = df[df["event_type"] == "PullRequestEvent"].groupby("repo_id").size().rename("prs")
-    issues = df[df["event_type"] == "IssuesEvent"].groupby("repo_id").size().rename("issues")
+    # One hash aggregation over (repo_id, event_type) gives every count at once;
+    # the pivot afterwards only touches the grouped rows, not the events.
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    counted = table.group_by(["repo_id", "event_type"], use_threads=False).aggregate([("repo_id", "count")])
+    # The first repo_name comes from its own group_by on repo_id alone: group
+    # order over (repo_id, event_type) isn't first-seen order once event_type
+    # is dictionary-encoded, as it is in silver
+    named = table.group_by("repo_id", use_threads=False).aggregate([("repo_name", "first")])
     
-    repo_names = df.groupby("repo_id")["repo_name"].first()
+    named_ids = named["repo_id"].to_numpy()
+    order = np.argsort(named_ids, kind="stable")
+    unique_ids = named_ids[order]
+    names = named["repo_name_first"].to_numpy(zero_copy_only=False)[order]
     
-    metrics = pd.concat([repo_names, watch, fork, push, pr, issues], axis=1).fillna(0)
-    metrics[["stars", "forks", "pushes", "prs", "issues"]] = metrics[["stars", "forks", "pushes", "prs", "issues"]].astype(int)
+    event_types = counted["event_type"].cast(pa.string()).to_numpy(zero_copy_only=False)
+    counts = counted["repo_id_count"].to_numpy()
+    rows = np.searchsorted(unique_ids, counted["repo_id"].to_numpy())
+    metrics = pd.DataFrame({"repo_id": unique_ids, "repo_name": names})
+    for column, event_type in GOLD_COUNTS.items():
+        values = np.zeros(len(unique_ids), dtype=np.int64)
+        mask = event_types == event_type
+        values[rows[mask]] = counts[mask]
+        metrics[column] = values
     
-    return metrics.reset_index()
+    return metrics
+
+def merge_metrics(frames):
+    # Sums per-repo counts over several metrics frames/tables (e.g. hourly
+    # partials, in hour order); the repo name is the first one seen
+    tables = [
+        (frame if isinstance(frame, pa.Table) else pa.Table.from_pandas(frame, preserve_index=False))
+        .select(METRICS_SCHEMA.names).replace_schema_metadata(None).cast(METRICS_SCHEMA)
+        for frame in frames
+    ]
+    grouped = pa.concat_tables(tables).group_by("repo_id", use_threads=False).aggregate(
+        [("repo_name", "first")] + [(column, "sum") for column in GOLD_COUNTS]
+    )
+    metrics = pd.DataFrame({
+        "repo_id": grouped["repo_id"].to_numpy(),
+        "repo_name": grouped["repo_name_first"].to_numpy(zero_copy_only=False),
+    })
+    for column in GOLD_COUNTS:
+        metrics[column] = grouped[f"{column}_sum"].to_numpy()
+    return metrics.sort_values("repo_id", ignore_index=True)
 
+def write_gold(s3, date, metrics, failed_hours=()):
+    metrics = metrics.assign(date=date)
+    failed_hours = sorted(failed_hours)
+    table = pa.Table.from_pandas(metrics, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"failed_hours": json.dumps(failed_hours).encode(),
+    })
+    buffer = BytesIO()
+    write_parquet(table, buffer)
+    
+    key = gold_key(date)
+    body = buffer.getvalue()
+    # row group byte ranges for per-repo lookups (ingest/history.py), built
+    # before the upload so a failure here leaves no uncatalogued gold file
+    index = build_gold_index(s3, date, body, metrics)
+    response = s3.put_object(Bucket=R2_BUCKET, Key=key, Body=body)
+    record_partition(s3, "gold", date, {
+        "key": key,
+        "rows": len(metrics),
+        "bytes": len(body),
+        "etag": response["ETag"],
+        "failed_hours": failed_hours,
+        "index": index,
+    })
+    print(f"Uploaded: {key} ({len(metrics)} repos)")
+    return key
+
+@timed("process_day_to_gold", keep=("date",))
 def process_day_to_gold(date):
     s3 = get_s3_client()
-    year, month, day = date.split("-")
-    
-    df = load_silver_day(s3, date)
-    metrics = build_daily_metrics(df)
-    metrics["date"] = date
-    
-    buffer = BytesIO()
-    metrics.to_parquet(buffer, index=False)
-    buffer.seek(0)
     
-    gold_key = f"gold/year={year}/month={month}/day={day}/metrics.parquet"
-    s3.put_object(Bucket=R2_BUCKET, Key=gold_key, Body=buffer.getvalue())
-    print(f"Uploaded: {gold_key} ({len(metrics)} repos)")
-    return gold_key
+    df = load_silver_day(s3, date, columns=["repo_id", "repo_name", "event_type"])
+    failed_hours = json.loads(df.schema.metadata.get(b"failed_hours", b"[]"))
+    if failed_hours:
+        print(f"Warning: {date} is partial, silver is missing hours {failed_hours}")
+    with stage("build_daily_metrics", date=date, rows_in=df.num_rows) as record:
+        metrics = build_daily_metrics(df)
+        record["rows_out"] = len(metrics)
+    return write_gold(s3, date, metrics, failed_hours)
 
 if __name__ == "__main__":
     from datetime import datetime, timedelta
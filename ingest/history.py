@@ -0,0 +1,224 @@
+import sys
+sys.path.append(".")
+
+import argparse
+import hashlib
+import io
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from ingest.config import get_s3_client, R2_BUCKET, FETCH_WORKERS, PARQUET_ZSTD_LEVEL, GOLD_ROW_GROUP_ROWS
+from ingest.cache import read_partition
+from ingest.catalog import list_partitions
+from ingest.layout import filter_repos
+from ingest.storage import partition_key
+
+# Per-repo lookups across gold days without downloading whole partitions.
+# write_gold stores an index for each day in its gold catalog entry:
+#   "index": {"row_groups": [[min_repo_id, max_repo_id, offset, length], ...],
+#             "footer": <Parquet footer bytes>,
+#             "names": {"key": .../names.parquet, "row_groups": [...], "footer": ...}}
+# Gold is sorted by repo_id, so a repo falls in at most one row group per day.
+# A lookup checks the id ranges in the catalog (days without the repo cost no
+# request at all), then fetches the footer and that row group with two ranged
+# GETs. names.parquet maps a hash of the lowercased repo_name to repo_id,
+# sorted by hash, and is searched the same way.
+NAMES_FILE = "names.parquet"
+# Arrow reads this much of the tail when opening a file, so the footer prefetch covers it
+FOOTER_PREFETCH = 64 * 1024
+
+def name_hash(names):
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(name.lower().encode(), digest_size=8).digest(), "little") for name in names),
+        dtype=np.uint64, count=len(names),
+    )
+
+def row_group_index(data, column):
+    # [min, max, byte offset, byte length] of every row group, from the file's own footer
+    metadata = pq.ParquetFile(io.BytesIO(data)).metadata
+    index = metadata.schema.to_arrow_schema().get_field_index(column)
+    row_groups = []
+    for group in range(metadata.num_row_groups):
+        row_group = metadata.row_group(group)
+        stats = row_group.column(index).statistics
+        if row_group.num_rows == 0:
+            # an empty day (every hour failed) still has one empty row group
+            continue
+        if stats is None or not stats.has_min_max:
+            # rows the index can't bound; readers fall back to reading the whole file
+            return None
+        chunks = [row_group.column(i) for i in range(row_group.num_columns)]
+        start = min(chunk.dictionary_page_offset if chunk.has_dictionary_page else chunk.data_page_offset
+                    for chunk in chunks)
+        end = max((chunk.dictionary_page_offset if chunk.has_dictionary_page else chunk.data_page_offset)
+                  + chunk.total_compressed_size for chunk in chunks)
+        row_groups.append([int(stats.min), int(stats.max), start, end - start])
+    # the footer length is the 4 bytes before the trailing "PAR1"
+    return {"row_groups": row_groups, "footer": int.from_bytes(data[-8:-4], "little")}
+
+def write_names_index(s3, date, metrics):
+    table = pa.table({
+        "name_hash": pa.array(name_hash(metrics["repo_name"]), pa.uint64()),
+        "repo_id": pa.array(metrics["repo_id"], pa.int64()),
+    })
+    table = table.take(pc.sort_indices(table, [("name_hash", "ascending")]))
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=GOLD_ROW_GROUP_ROWS, compression="zstd",
+                   compression_level=PARQUET_ZSTD_LEVEL, write_statistics=True)
+    body = buffer.getvalue()
+    index = row_group_index(body, "name_hash")
+    if index is None:
+        return None
+    key = partition_key("gold", date, filename=NAMES_FILE)
+    response = s3.put_object(Bucket=R2_BUCKET, Key=key, Body=body)
+    return {"key": key, "bytes": len(body), "etag": response["ETag"], **index}
+
+def build_gold_index(s3, date, body, metrics):
+    # called by write_gold with the encoded gold file before it's uploaded;
+    # None when the file can't be indexed
+    index = row_group_index(body, "repo_id")
+    if index is None:
+        return None
+    return {**index, "names": write_names_index(s3, date, metrics)}
+
+class RangedFile(io.RawIOBase):
+    # Seekable, read-only view of an object that fetches byte ranges on demand.
+    # prefetch() pulls a known span with one GET; reads inside fetched spans are
+    # served from memory. If-Match pins every range to the indexed version.
+    def __init__(self, s3, key, size, etag=None):
+        self.s3 = s3
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.position = 0
+        self.spans = []
+        self.requests = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = base + offset
+        return self.position
+
+    def prefetch(self, start, length):
+        start = max(start, 0)
+        end = min(start + length, self.size)
+        if start >= end or self._span(start, end) is not None:
+            return
+        condition = {"IfMatch": self.etag} if self.etag else {}
+        response = self.s3.get_object(Bucket=R2_BUCKET, Key=self.key, Range=f"bytes={start}-{end - 1}", **condition)
+        self.spans.append((start, response["Body"].read()))
+        self.requests += 1
+
+    def _span(self, start, end):
+        for span_start, data in self.spans:
+            if span_start <= start and end <= span_start + len(data):
+                return span_start, data
+        return None
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.size - self.position)
+        if n <= 0:
+            return 0
+        end = self.position + n
+        span = self._span(self.position, end)
+        if span is None:
+            self.prefetch(self.position, n)
+            span = self._span(self.position, end)
+        span_start, data = span
+        buffer[:n] = data[self.position - span_start:end - span_start]
+        self.position = end
+        return n
+
+def read_indexed_rows(s3, entry, index, values, filter_rows):
+    # rows whose column value is in values, reading only the row groups that can hold them
+    values = np.asarray(values)
+    groups = [
+        group for group, (low, high, _, _) in enumerate(index["row_groups"])
+        if ((values >= low) & (values <= high)).any()
+    ]
+    if not groups:
+        return None
+    source = RangedFile(s3, entry["key"], entry["bytes"], entry.get("etag"))
+    tail = max(index["footer"] + 8, FOOTER_PREFETCH)
+    source.prefetch(entry["bytes"] - tail, tail)
+    for group in groups:
+        _, _, offset, length = index["row_groups"][group]
+        source.prefetch(offset, length)
+    table = pq.ParquetFile(source).read_row_groups(groups)
+    return filter_rows(table)
+
+def read_repo_day(s3, entry, repo_ids):
+    index = entry.get("index")
+    if index is None or getattr(s3, "local_path", None) is not None:
+        # days written before the index, and the filesystem backend, which maps the file anyway
+        table = read_partition(s3, entry["key"], repo_ids=repo_ids)
+        return table if table.num_rows else None
+    try:
+        return read_indexed_rows(s3, entry, index, repo_ids, lambda table: filter_repos(table, repo_ids))
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") != 412:
+            raise
+        # rewritten since the catalog entry was made
+        table = read_partition(s3, entry["key"], repo_ids=repo_ids)
+        return table if table.num_rows else None
+
+def dates_between(partitions, start=None, end=None):
+    return sorted(date for date in partitions if (start is None or date >= start) and (end is None or date <= end))
+
+def get_repo_history(repo_id, start=None, end=None, s3=None, workers=FETCH_WORKERS):
+    # One row per gold day in [start, end] that has activity for repo_id, oldest first
+    s3 = s3 or get_s3_client()
+    partitions = list_partitions(s3, "gold", "metrics.parquet")
+    dates = dates_between(partitions, start, end)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        tables = list(pool.map(lambda date: read_repo_day(s3, partitions[date], [repo_id]), dates))
+    frames = [table.replace_schema_metadata(None).to_pandas() for table in tables if table is not None]
+    if not frames:
+        return pd.DataFrame(columns=["repo_id", "repo_name", "stars", "forks", "pushes", "prs", "issues", "date"])
+    return pd.concat(frames, ignore_index=True).sort_values("date", ignore_index=True)
+
+def find_repo_id(repo_name, start=None, end=None, s3=None):
+    # Newest day first, since names can move between repos; None if the name isn't in the window
+    s3 = s3 or get_s3_client()
+    partitions = list_partitions(s3, "gold", "metrics.parquet")
+    target = name_hash([repo_name])
+    for date in reversed(dates_between(partitions, start, end)):
+        entry = partitions[date]
+        names = (entry.get("index") or {}).get("names")
+        if names is None or getattr(s3, "local_path", None) is not None:
+            table = read_partition(s3, entry["key"], columns=["repo_id", "repo_name"])
+            matches = table.filter(pc.equal(pc.utf8_lower(table["repo_name"]), repo_name.lower()))
+        else:
+            matches = read_indexed_rows(
+                s3, names, names, target,
+                lambda table: table.filter(pc.equal(table["name_hash"], pa.scalar(int(target[0]), pa.uint64()))),
+            )
+        if matches is not None and matches.num_rows:
+            return int(matches["repo_id"][0].as_py())
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print one repo's daily gold history")
+    parser.add_argument("repo", help="repo_id or owner/name")
+    parser.add_argument("--start", default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="Last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    repo_id = int(args.repo) if args.repo.isdigit() else find_repo_id(args.repo, args.start, args.end)
+    if repo_id is None:
+        print(f"{args.repo} not found in gold")
+    else:
+        print(get_repo_history(repo_id, args.start, args.end).to_string(index=False))
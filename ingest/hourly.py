@@ -0,0 +1,178 @@
+import sys
+sys.path.append(".")
+
+import argparse
+import json
+import pyarrow as pa
+import requests
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+from ingest.config import get_s3_client, R2_BUCKET, FINALIZE_AFTER_HOURS, PUBLISH_DELAY_MINUTES
+from ingest.cache import read_partition, read_partitions
+from ingest.catalog import load_catalog, update_catalog, remove_partitions
+from ingest.fetch import make_session, with_retries
+from ingest.gold import build_daily_metrics, merge_metrics, write_gold
+from ingest.silver import stream_hour_to_records
+from ingest.storage import hourly_key, hourly_partial_key, delete_keys
+from ingest.layout import write_parquet
+from ingest.telemetry import stage, write_report
+
+# Incremental mode: each GH Archive hour goes straight from the download to a
+# per-repo counts file, and a running aggregate for the day absorbs it. Daily
+# gold is finalized by summing the 24 hourly files, so neither silver nor a
+# whole day is ever reprocessed.
+#   hourly/year=.../day=DD/hour=HH/metrics.parquet   one hour's counts
+#   hourly/year=.../day=DD/partial.parquet           running sum of the hours so far
+#   hourly/_catalog.json                             {"partitions": {date: {"hours": {...},
+#                                                     "partial": {..., "hours": [...]}, "finalized": bool}}}
+
+def put_metrics(s3, key, metrics, hours):
+    table = pa.Table.from_pandas(metrics, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"hours": json.dumps(hours).encode()})
+    buffer = BytesIO()
+    write_parquet(table, buffer)
+    body = buffer.getvalue()
+    response = s3.put_object(Bucket=R2_BUCKET, Key=key, Body=body)
+    return {"key": key, "rows": len(metrics), "bytes": len(body), "etag": response["ETag"]}
+
+def process_hour_to_gold(s3, date, hour, session=None):
+    with stage("process_hour_to_gold", date=date, hour=hour) as record:
+        events = with_retries(lambda: stream_hour_to_records(date, hour, session=session))
+        metrics = build_daily_metrics(events)
+        entry = put_metrics(s3, hourly_key(date, hour), metrics, [hour])
+        record.update(rows_in=events.num_rows, rows_out=len(metrics), bytes_out=entry["bytes"])
+
+    def update(catalog):
+        catalog["partitions"].setdefault(date, {"hours": {}})["hours"][f"{hour:02d}"] = entry
+    update_catalog(s3, "hourly", update)
+    print(f"{date} hour {hour}: {events.num_rows} events, {len(metrics)} repos")
+    return entry
+
+def update_partial(s3, date, entry):
+    # Folds hours that are in the catalog but not yet in the running aggregate.
+    # Normally that's just the hour that was written, but it also catches up
+    # after a run died between writing an hour and updating the aggregate.
+    partial = entry.get("partial") or {"hours": []}
+    new_hours = sorted(set(int(hour) for hour in entry["hours"]) - set(partial["hours"]))
+    if not new_hours:
+        return partial
+
+    with stage("update_partial", date=date, hours=new_hours) as record:
+        frames = [read_partition(s3, partial["key"])] if partial["hours"] else []
+        frames += [read_partition(s3, entry["hours"][f"{hour:02d}"]["key"]) for hour in new_hours]
+        metrics = merge_metrics(frames)
+        hours = sorted(partial["hours"] + new_hours)
+        partial = {**put_metrics(s3, hourly_partial_key(date), metrics, hours), "hours": hours}
+        record["rows_out"] = len(metrics)
+
+    def update(catalog):
+        catalog["partitions"][date]["partial"] = partial
+    update_catalog(s3, "hourly", update)
+    print(f"{date}: running aggregate covers {len(hours)} hours, {len(metrics)} repos")
+    return partial
+
+def finalize_day(s3, date, entry):
+    # Daily gold = sum of the hourly files; any hour still missing is recorded as failed
+    hours = sorted(int(hour) for hour in entry["hours"])
+    with stage("finalize_day", date=date) as record:
+        keys = [entry["hours"][f"{hour:02d}"]["key"] for hour in hours]
+        tables = read_partitions(s3, keys)
+        if any(tables[key] is None for key in keys):
+            # the running aggregate holds the same sums, as long as it covers every hour
+            partial = entry.get("partial") or {"hours": []}
+            if set(partial["hours"]) != set(hours):
+                raise ValueError(f"{date}: missing hourly files and no aggregate covering hours {hours}")
+            print(f"{date}: some hourly files are missing, finalizing from the running aggregate")
+            tables = {partial["key"]: read_partition(s3, partial["key"])}
+        metrics = merge_metrics(tables.values())
+        failed_hours = sorted(set(range(24)) - set(hours))
+        key = write_gold(s3, date, metrics, failed_hours)
+        record.update(rows_out=len(metrics), failed_hours=failed_hours)
+
+    def update(catalog):
+        catalog["partitions"][date]["finalized"] = True
+    update_catalog(s3, "hourly", update)
+    return key
+
+def prune_hourly(s3, catalog, keep_after, gold_dates=()):
+    # hourly files are only needed until their day is in gold and has been scored
+    old = [
+        date for date, entry in catalog["partitions"].items()
+        if (entry.get("finalized") or date in gold_dates) and date < keep_after
+    ]
+    if not old:
+        return
+    keys = []
+    for date in old:
+        entry = catalog["partitions"][date]
+        keys += [hour["key"] for hour in entry["hours"].values()]
+        if entry.get("partial"):
+            keys.append(entry["partial"]["key"])
+    delete_keys(s3, keys)
+    remove_partitions(s3, "hourly", old)
+    print(f"Pruned hourly files for {old}")
+
+def published_hours(now, days=2):
+    # (date, hour) pairs GH Archive should have published by now, oldest first
+    latest = (now - timedelta(minutes=PUBLISH_DELAY_MINUTES)).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    start = (latest - timedelta(days=days - 1)).replace(hour=0)
+    hours = []
+    current = start
+    while current <= latest:
+        hours.append((current.strftime("%Y-%m-%d"), current.hour))
+        current += timedelta(hours=1)
+    return hours
+
+def run_hourly(now=None, days=2):
+    now = now or datetime.now(timezone.utc)
+    s3 = get_s3_client()
+    session = make_session()
+    catalog, _ = load_catalog(s3, "hourly")
+    partitions = (catalog or {"partitions": {}})["partitions"]
+    gold_catalog, _ = load_catalog(s3, "gold")
+    gold_dates = set((gold_catalog or {"partitions": {}})["partitions"])
+
+    for date, hour in published_hours(now, days):
+        entry = partitions.get(date, {"hours": {}})
+        if date in gold_dates or f"{hour:02d}" in entry["hours"]:
+            continue
+        try:
+            process_hour_to_gold(s3, date, hour, session)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                hour_end = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(hours=hour + 1)
+                if now - hour_end < timedelta(hours=FINALIZE_AFTER_HOURS):
+                    # not published yet; later hours won't be either
+                    print(f"{date} hour {hour} not published yet")
+                    break
+                # GH Archive does lose the odd hour; the day is finalized without it
+                print(f"{date} hour {hour} is missing from GH Archive")
+                continue
+            print(f"Failed {date} hour {hour}: {e}")
+        except Exception as e:
+            print(f"Failed {date} hour {hour}: {e}")
+
+    catalog, _ = load_catalog(s3, "hourly")
+    partitions = (catalog or {"partitions": {}})["partitions"]
+    for date in sorted(partitions):
+        entry = partitions[date]
+        if entry.get("finalized") or date in gold_dates:
+            continue
+        entry["partial"] = update_partial(s3, date, entry)
+        day_end = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+        complete = len(entry["hours"]) == 24
+        overdue = now >= day_end + timedelta(hours=FINALIZE_AFTER_HOURS)
+        if complete or (overdue and entry["hours"]):
+            finalize_day(s3, date, entry)
+
+    catalog, _ = load_catalog(s3, "hourly")
+    if catalog:
+        prune_hourly(s3, catalog, (now - timedelta(days=days)).strftime("%Y-%m-%d"), gold_dates)
+    return s3
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process newly published GH Archive hours")
+    parser.add_argument("--days", type=int, default=2, help="How many days back to look for unprocessed hours")
+    args = parser.parse_args()
+    s3 = run_hourly(days=args.days)
+    write_report(s3, "hourly_ingest")
@@ -0,0 +1,47 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from .config import PARQUET_ZSTD_LEVEL, GOLD_ROW_GROUP_ROWS
+
+# Parquet layout shared by the silver, gold and hourly writers. Rows are sorted
+# by repo_id, so each row group covers a narrow repo_id range and its min/max
+# statistics let readers skip every group that can't hold the repos they want
+# (matching_row_groups). Silver keeps one row group per hour so it can still
+# be written incrementally; only rows within an hour are sorted, which is
+# enough for dictionary runs and compression, if not for skipping.
+DICTIONARY_COLUMNS = ["event_type", "repo_name", "date"]
+
+def write_options(schema):
+    return {
+        "compression": "zstd",
+        "compression_level": PARQUET_ZSTD_LEVEL,
+        "use_dictionary": [column for column in DICTIONARY_COLUMNS if column in schema.names],
+        "write_statistics": True,
+        "sorting_columns": [pq.SortingColumn(schema.get_field_index("repo_id"))],
+    }
+
+def sort_by_repo(table):
+    # stable, so a repo's events keep their order (gold takes the first repo_name seen)
+    return table.take(pc.sort_indices(table, [("repo_id", "ascending")]))
+
+def write_parquet(table, sink, row_group_size=GOLD_ROW_GROUP_ROWS):
+    pq.write_table(sort_by_repo(table), sink, row_group_size=row_group_size, **write_options(table.schema))
+
+def matching_row_groups(metadata, repo_ids):
+    # row groups whose repo_id [min, max] range holds at least one of repo_ids
+    index = metadata.schema.to_arrow_schema().get_field_index("repo_id")
+    ids = np.unique(np.asarray(repo_ids, dtype=np.int64))
+    groups = []
+    for group in range(metadata.num_row_groups):
+        stats = metadata.row_group(group).column(index).statistics
+        if stats is None or not stats.has_min_max:
+            groups.append(group)
+            continue
+        first = np.searchsorted(ids, stats.min)
+        if first < len(ids) and ids[first] <= stats.max:
+            groups.append(group)
+    return groups
+
+def filter_repos(table, repo_ids):
+    return table.filter(pc.is_in(table["repo_id"], value_set=pa.array(np.asarray(repo_ids, dtype=np.int64))))
@@ -0,0 +1,227 @@
+import fcntl
+import mmap
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+# Filesystem stand-in for the subset of the boto3 S3 client the pipeline uses,
+# selected with S3_BACKEND=local (see get_s3_client). Objects are plain files
+# under <root>/<bucket>/<key>, so several processes can share one store. ETags
+# come from the file's mtime and size, which is enough for the conditional
+# requests the catalog, cache and registry make. GET bodies are read out of a
+# read-only mmap of the file, and local_path() lets readers map an object
+# directly (see cache.read_partition). Meant for benchmarks, development and
+# single-box runs, not as a faithful S3 emulation.
+
+def _error(code, status, key=None):
+    return ClientError(
+        {"Error": {"Code": code, "Message": code, "Key": key},
+         "ResponseMetadata": {"HTTPStatusCode": status}},
+        "LocalS3",
+    )
+
+class LocalBody:
+    # A replaced object keeps its old inode, so the mapping stays valid until closed
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # empty files can't be mapped
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b"")
+        self._position = 0
+
+    def read(self, amt=None):
+        if self._view is None:
+            return b""
+        end = len(self._view) if amt is None else min(self._position + amt, len(self._view))
+        data = bytes(self._view[self._position:end])
+        self._position = end
+        if amt is None or not data:
+            self.close()
+        return data
+
+    def iter_chunks(self, chunk_size=1024 * 1024):
+        for chunk in iter(lambda: self.read(chunk_size), b""):
+            yield chunk
+
+    def close(self):
+        if self._view is None:
+            return
+        self._view.release()
+        self._view = None
+        if self._map is not None:
+            self._map.close()
+
+class LocalPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.client.list_objects_v2(**kwargs, **({"ContinuationToken": token} if token else {}))
+            yield page
+            if not page["IsTruncated"]:
+                return
+            token = page["NextContinuationToken"]
+
+class LocalS3Client:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, bucket, key):
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise _error("InvalidKey", 400, key)
+        return path
+
+    def _etag(self, stat):
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def _stat(self, bucket, key):
+        try:
+            return os.stat(self._path(bucket, key))
+        except FileNotFoundError:
+            raise _error("NoSuchKey", 404, key)
+
+    def _write(self, bucket, key, write):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+        return {"ETag": self._etag(os.stat(path))}
+
+    def _locked(self, bucket):
+        # conditional writes hold an flock on the bucket so they're atomic across processes
+        lock_path = os.path.join(self.root, f".{bucket}.lock")
+        lock_file = open(lock_path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def local_path(self, Bucket, Key):
+        self._stat(Bucket, Key)
+        return self._path(Bucket, Key)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        stat = self._stat(Bucket, Key)
+        return {
+            "ContentLength": stat.st_size,
+            "ETag": self._etag(stat),
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        }
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, IfMatch=None, **kwargs):
+        head = self.head_object(Bucket, Key)
+        if IfNoneMatch is not None and IfNoneMatch in ("*", head["ETag"]):
+            raise _error("NotModified", 304, Key)
+        if IfMatch is not None and IfMatch != head["ETag"]:
+            raise _error("PreconditionFailed", 412, Key)
+        return {**head, "Body": LocalBody(self._path(Bucket, Key))}
+
+    def put_object(self, Bucket, Key, Body=b"", IfMatch=None, IfNoneMatch=None, **kwargs):
+        def write(f):
+            if hasattr(Body, "read"):
+                shutil.copyfileobj(Body, f)
+            else:
+                f.write(Body.encode() if isinstance(Body, str) else Body)
+
+        if IfMatch is None and IfNoneMatch is None:
+            return self._write(Bucket, Key, write)
+        with self._lock, self._locked(Bucket):
+            try:
+                etag = self._etag(os.stat(self._path(Bucket, Key)))
+            except FileNotFoundError:
+                etag = None
+            if IfNoneMatch == "*" and etag is not None:
+                raise _error("PreconditionFailed", 412, Key)
+            if IfMatch is not None and IfMatch != etag:
+                raise _error("PreconditionFailed", 412, Key)
+            return self._write(Bucket, Key, write)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None, **kwargs):
+        self._write(Bucket, Key, lambda f: shutil.copyfileobj(Fileobj, f))
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None, **kwargs):
+        with open(Filename, "rb") as source:
+            self.upload_fileobj(source, Bucket, Key)
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Config=None, **kwargs):
+        self._stat(Bucket, Key)
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket, obj["Key"])
+        return {"Errors": []}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000, **kwargs):
+        bucket_root = os.path.join(self.root, Bucket)
+        # only walk the directory the prefix is in; the rest of the prefix filters names
+        start_dir = os.path.join(bucket_root, os.path.dirname(Prefix))
+        keys = []
+        for dir_path, _, file_names in os.walk(start_dir):
+            for name in file_names:
+                if name.endswith(".tmp"):
+                    continue
+                key = os.path.relpath(os.path.join(dir_path, name), bucket_root).replace(os.sep, "/")
+                if key.startswith(Prefix) and (ContinuationToken is None or key > ContinuationToken):
+                    keys.append(key)
+        keys.sort()
+        page_keys = keys[:MaxKeys]
+        contents = []
+        for key in page_keys:
+            head = self.head_object(Bucket, key)
+            contents.append({"Key": key, "Size": head["ContentLength"], "ETag": head["ETag"],
+                             "LastModified": head["LastModified"]})
+        page = {"Contents": contents, "KeyCount": len(contents), "IsTruncated": len(keys) > MaxKeys}
+        if page["IsTruncated"]:
+            page["NextContinuationToken"] = page_keys[-1]
+        return page
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        return LocalPaginator(self)
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, ".uploads", upload_id)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return {"UploadId": upload_id, "Bucket": Bucket, "Key": Key}
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body, **kwargs):
+        path = os.path.join(self._upload_dir(UploadId), f"{PartNumber:05d}")
+        with open(path, "wb") as f:
+            f.write(Body)
+        return {"ETag": self._etag(os.stat(path))}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        upload_dir = self._upload_dir(UploadId)
+
+        def write(f):
+            for part in sorted(MultipartUpload["Parts"], key=lambda p: p["PartNumber"]):
+                with open(os.path.join(upload_dir, f"{part['PartNumber']:05d}"), "rb") as source:
+                    shutil.copyfileobj(source, f)
+        response = self._write(Bucket, Key, write)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return response
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        shutil.rmtree(self._upload_dir(UploadId), ignore_errors=True)
+        return {}
@@ -1,70 +1,252 @@
 import gzip
 import json
-import pandas as pd
-from io import BytesIO
+import re
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from array import array
+from boto3.s3.transfer import TransferConfig
 import sys
-from .config import get_s3_client, R2_BUCKET
+from .config import get_s3_client, R2_BUCKET, FETCH_WORKERS, MULTIPART_PART_SIZE, SILVER_SPOOL_BYTES
+from .bronze import open_hour
+from .fetch import fetch_hours
+from .catalog import record_partition, remove_partitions
+from .storage import bronze_key, silver_key, delete_keys
+from .layout import write_options, sort_by_repo
+from .telemetry import stage, timed
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
 
 KEEP_EVENTS = ["WatchEvent", "ForkEvent", "PushEvent", "PullRequestEvent", "IssuesEvent", "CreateEvent"]
+KEEP_EVENT_BYTES = frozenset(event.encode() for event in KEEP_EVENTS)
 
-def process_hour_to_records(s3, date, hour):
-    year, month, day = date.split("-")
-    key = f"bronze/year={year}/month={month}/day={day}/hour={hour:02d}/events.json.gz"
+# GH Archive writes "type" right after "id", so the first match near the start of
+# the line is the event type (nested payload objects have "type" keys much later).
+# Lines without a match fall through to the full decode.
+TYPE_SCAN_BYTES = 256
+TYPE_PATTERN = re.compile(rb'"type":\s*"([A-Za-z]+)"')
+
+SILVER_SCHEMA = pa.schema([
+    ("event_type", pa.dictionary(pa.int8(), pa.string())),
+    ("repo_id", pa.int64()),
+    ("repo_name", pa.string()),
+    ("actor_id", pa.int64()),
+    ("created_at", pa.timestamp("s", tz="UTC")),
+])
+EVENT_CODES = {event: code for code, event in enumerate(KEEP_EVENTS)}
+BUILDER_BATCH_ROWS = 65536
+CREATED_AT_TYPE = pa.timestamp("s", tz="UTC")
+FRACTIONAL_SECONDS = re.compile(r"(\d{2}:\d{2}:\d{2})\.\d+")
+
+def parse_created_at(values):
+    # One vectorized cast for the normal case. A single odd value fails the
+    # whole cast, so then values are parsed one at a time: fractional seconds
+    # are dropped and anything still unparseable becomes null.
+    try:
+        return pa.array(values, pa.string()).cast(CREATED_AT_TYPE)
+    except pa.ArrowInvalid:
+        pass
+
+    def parse(value):
+        for candidate in (value, FRACTIONAL_SECONDS.sub(r"\1", value)):
+            try:
+                return pa.scalar(candidate, pa.string()).cast(CREATED_AT_TYPE)
+            except pa.ArrowInvalid:
+                continue
+        return pa.scalar(None, CREATED_AT_TYPE)
+    return pa.array([parse(value) for value in values], CREATED_AT_TYPE)
+
+class SilverBuilder:
+    # Appends events into typed column buffers and seals them into Arrow record
+    # batches every BUILDER_BATCH_ROWS rows, so only one batch worth of Python
+    # objects is alive at a time.
+    def __init__(self):
+        self.batches = []
+        self.rows = 0
+        self._reset()
+    
+    def _reset(self):
+        self.event_codes = array("b")
+        self.repo_ids = array("q")
+        self.repo_names = []
+        self.actor_ids = array("q")
+        self.created_at = []
+    
+    def append(self, event_type, repo_id, repo_name, actor_id, created_at):
+        # convert first so a bad event can't leave the columns different lengths
+        code = EVENT_CODES[event_type]
+        repo_id, actor_id = int(repo_id), int(actor_id)
+        if not isinstance(repo_name, str) or not isinstance(created_at, str):
+            raise TypeError("repo_name and created_at must be strings")
+        
+        self.event_codes.append(code)
+        self.repo_ids.append(repo_id)
+        self.repo_names.append(repo_name)
+        self.actor_ids.append(actor_id)
+        self.created_at.append(created_at)
+        self.rows += 1
+        if len(self.repo_ids) >= BUILDER_BATCH_ROWS:
+            self._flush()
+    
+    def _flush(self):
+        if not self.repo_ids:
+            return
+        codes = pa.array(np.frombuffer(self.event_codes, dtype=np.int8))
+        created_at = parse_created_at(self.created_at)
+        batch = pa.record_batch([
+            pa.DictionaryArray.from_arrays(codes, pa.array(KEEP_EVENTS)),
+            pa.array(np.frombuffer(self.repo_ids, dtype=np.int64)),
+            pa.array(self.repo_names, pa.string()),
+            pa.array(np.frombuffer(self.actor_ids, dtype=np.int64)),
+            created_at,
+        ], schema=SILVER_SCHEMA)
+        if created_at.null_count:
+            # events with an unparseable created_at are skipped, like other malformed events
+            self.rows -= created_at.null_count
+            batch = batch.filter(created_at.is_valid())
+        self.batches.append(batch)
+        self._reset()
     
-    response = s3.get_object(Bucket=R2_BUCKET, Key=key)
-    compressed = response["Body"].read()
-    decompressed = gzip.decompress(compressed)
+    def __len__(self):
+        return self.rows
     
-    records = []
-    for line in decompressed.split(b"\n"):
-        if not line:
+    def to_table(self):
+        self._flush()
+        return pa.Table.from_batches(self.batches, schema=SILVER_SCHEMA)
+
+def parse_events(lines):
+    builder = SilverBuilder()
+    for line in lines:
+        if not line.strip():
+            continue
+        match = TYPE_PATTERN.search(line, 0, TYPE_SCAN_BYTES)
+        if match and match.group(1) not in KEEP_EVENT_BYTES:
             continue
         try:
-            event = json.loads(line)
+            event = loads(line)
             if event["type"] not in KEEP_EVENTS:
                 continue
-            records.append({
-                "event_type": event["type"],
-                "repo_id": event["repo"]["id"],
-                "repo_name": event["repo"]["name"],
-                "actor_id": event["actor"]["id"],
-                "created_at": event["created_at"]
-            })
+            builder.append(
+                event["type"],
+                event["repo"]["id"],
+                event["repo"]["name"],
+                event["actor"]["id"],
+                event["created_at"]
+            )
         
-        except (KeyError, json.JSONDecodeError):
+        except (KeyError, TypeError, ValueError):
             continue
-    return records
+    return builder.to_table()
+
+def process_hour_to_records(s3, date, hour):
+    key = bronze_key(date, hour)
+    
+    with stage("process_hour_to_records", date=date, hour=hour) as record:
+        response = s3.get_object(Bucket=R2_BUCKET, Key=key)
+        compressed = response["Body"].read()
+        decompressed = gzip.decompress(compressed)
+        table = parse_events(decompressed.split(b"\n"))
+        record.update(bytes_in=len(compressed), rows_in=decompressed.count(b"\n"), rows_out=table.num_rows)
+        return table
+
+def stream_hour_to_records(date, hour, session=None, s3=None):
+    # Decompresses and filters while the body is still downloading, so the raw
+    # hour never touches R2 and is never fully held in memory
+    with stage("stream_hour_to_records", date=date, hour=hour) as record:
+        response = open_hour(date, hour, session)
+        with response, gzip.GzipFile(fileobj=response.raw) as lines:
+            table = parse_events(lines)
+            record.update(bytes_in=response.raw.tell(), rows_out=table.num_rows)
+        return table
 
+class SilverDayWriter:
+    # Writes each hour as its own Parquet row group into a spooled temp file as
+    # soon as it arrives, so memory is bounded by one hour instead of the whole
+    # day. Hours may arrive out of order (fetch_hours hands them over as they
+    # finish downloading); the hour of each row group (in row group order) and
+    # the hours that failed are stored in the file metadata, and gold reads the
+    # row groups back in hour order.
+    def __init__(self, s3, date):
+        self.s3 = s3
+        self.date = date
+        self.key = silver_key(date)
+        self.file = tempfile.SpooledTemporaryFile(max_size=SILVER_SPOOL_BYTES)
+        self.writer = pq.ParquetWriter(self.file, SILVER_SCHEMA, **write_options(SILVER_SCHEMA))
+        self.hours = []
+        self.rows = 0
+    
+    def write_hour(self, hour, table):
+        if table.num_rows:
+            self.writer.write_table(sort_by_repo(table), row_group_size=table.num_rows)
+            self.hours.append(hour)
+        self.rows += table.num_rows
+        return table.num_rows
+    
+    def close(self, failed_hours=()):
+        self.writer.add_key_value_metadata({
+            "hours": json.dumps(self.hours),
+            "failed_hours": json.dumps(sorted(failed_hours)),
+        })
+        self.writer.close()
+        self.file.seek(0)
+        self.s3.upload_fileobj(
+            self.file, R2_BUCKET, self.key,
+            Config=TransferConfig(multipart_threshold=MULTIPART_PART_SIZE, multipart_chunksize=MULTIPART_PART_SIZE)
+        )
+        self.file.close()
+        head = self.s3.head_object(Bucket=R2_BUCKET, Key=self.key)
+        record_partition(self.s3, "silver", self.date, {
+            "key": self.key,
+            "rows": self.rows,
+            "bytes": head["ContentLength"],
+            "etag": head["ETag"],
+            "hours": sorted(self.hours),
+            "failed_hours": sorted(failed_hours),
+        })
+        print(f"Uploaded: {self.key} ({self.rows} total events)")
+        if failed_hours:
+            print(f"Silver for {self.key} is partial, missing hours {sorted(failed_hours)}")
+        return self.key
+
+@timed("process_day_to_silver", keep=("date",))
 def process_day_to_silver(date):
     s3 = get_s3_client()
-    year, month, day = date.split("-")
+    writer = SilverDayWriter(s3, date)
     
-    all_records = []
+    failed = []
     for hour in range(24):
         try:
             records = process_hour_to_records(s3, date, hour)
-            all_records.extend(records)
+            writer.write_hour(hour, records)
             print(f"Processed hour {hour}: {len(records)} events")
         except Exception as e:
+            failed.append(hour)
             print(f"Failed hour {hour}: {e}")
     
-    df = pd.DataFrame(all_records)
-    
-    buffer = BytesIO()
-    df.to_parquet(buffer, index=False)
-    buffer.seek(0)
-    print(f"R2_BUCKET = {R2_BUCKET}")
-    silver_key = f"silver/year={year}/month={month}/day={day}/events.parquet"
-    s3.put_object(Bucket=R2_BUCKET, Key=silver_key, Body=buffer.getvalue())
-    print(f"Uploaded: {silver_key} ({len(df)} total events)")
-    return silver_key
+    return writer.close(failed), failed
+
+@timed("process_day_direct_to_silver", keep=("date",))
+def process_day_direct_to_silver(date, workers=FETCH_WORKERS, s3=None):
+    s3 = s3 or get_s3_client()
+    writer = SilverDayWriter(s3, date)
+    done, failed = fetch_hours(
+        date, range(24), workers, s3=s3, task=stream_hour_to_records, on_done=writer.write_hour
+    )
+    if failed:
+        print(f"{date}: {len(failed)} hours still failed after retries: {sorted(failed)}")
+    return writer.close(failed), sorted(failed)
 
 def delete_silver_day(date):
     s3 = get_s3_client()
-    year, month, day = date.split("-")
-    key = f"silver/year={year}/month={month}/day={day}/events.parquet"
+    key = silver_key(date)
     try:
-        s3.delete_object(Bucket=R2_BUCKET, Key=key)
+        delete_keys(s3, [key])
+        remove_partitions(s3, "silver", [date])
         print(f"Deleted silver for {date}")
     except:
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,126 @@
+import os
+import threading
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from .config import R2_BUCKET, S3_BACKEND, LOCAL_S3_DIR, S3_MAX_POOL_CONNECTIONS, FETCH_WORKERS
+
+# Storage layer shared by every stage: one pooled client per process, the
+# partition key layout, and bulk get/put/delete.
+#
+# boto3 clients are thread-safe once built, but building one takes tens of
+# milliseconds and each has its own connection pool, so the whole process
+# shares a single client whose pool is big enough for every fetch thread
+# (S3_MAX_POOL_CONNECTIONS). It is rebuilt after a fork, since a child can't
+# reuse the parent's sockets. S3_BACKEND=local swaps in the filesystem backend
+# (ingest/local_s3.py).
+DELETE_BATCH_SIZE = 1000
+
+# file name of a partition in each layer
+LAYER_FILES = {
+    "bronze": "events.json.gz",
+    "silver": "events.parquet",
+    "gold": "metrics.parquet",
+    "hourly": "metrics.parquet",
+}
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def make_client():
+    if S3_BACKEND == "local":
+        from .local_s3 import LocalS3Client
+        return LocalS3Client(LOCAL_S3_DIR)
+    from .telemetry import instrument_s3
+    # boto3.client() goes through the default session, which isn't thread-safe
+    session = boto3.session.Session()
+    return instrument_s3(session.client(
+        "s3",
+        endpoint_url=os.getenv("R2_ENDPOINT_URL"),
+        aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY"),
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            retries={"max_attempts": 5, "mode": "standard"},
+        ),
+    ))
+
+def get_client():
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = make_client()
+            _client_pid = os.getpid()
+        return _client
+
+def partition_prefix(layer, date):
+    year, month, day = date.split("-")
+    return f"{layer}/year={year}/month={month}/day={day}/"
+
+def partition_key(layer, date, hour=None, filename=None):
+    prefix = partition_prefix(layer, date)
+    if hour is not None:
+        prefix += f"hour={hour:02d}/"
+    return prefix + (filename or LAYER_FILES[layer])
+
+def bronze_key(date, hour):
+    return partition_key("bronze", date, hour)
+
+def silver_key(date):
+    return partition_key("silver", date)
+
+def gold_key(date):
+    return partition_key("gold", date)
+
+def hourly_key(date, hour):
+    return partition_key("hourly", date, hour)
+
+def hourly_partial_key(date):
+    # running aggregate of the hours so far
+    return partition_key("hourly", date, filename="partial.parquet")
+
+def parse_partition_key(key):
+    # bronze/year=2026/month=01/day=02/hour=05/... -> ("2026-01-02", 5); hour is None for daily files
+    parts = dict(part.split("=", 1) for part in key.split("/") if "=" in part)
+    hour = int(parts["hour"]) if "hour" in parts else None
+    return f"{parts['year']}-{parts['month']}-{parts['day']}", hour
+
+def get_objects(s3, keys, workers=FETCH_WORKERS):
+    # Concurrent GETs; missing keys map to None
+    def get(key):
+        try:
+            return s3.get_object(Bucket=R2_BUCKET, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    keys = list(keys)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(keys, pool.map(get, keys)))
+
+def put_objects(s3, objects, workers=FETCH_WORKERS):
+    # objects maps key -> body, or key -> dict of extra put_object arguments
+    # including Body (e.g. ContentType). Returns key -> ETag.
+    def put(item):
+        key, body = item
+        args = body if isinstance(body, dict) else {"Body": body}
+        return s3.put_object(Bucket=R2_BUCKET, Key=key, **args)["ETag"]
+
+    items = list(objects.items())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip([key for key, _ in items], pool.map(put, items)))
+
+def delete_keys(s3, keys):
+    keys = list(keys)
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        response = s3.delete_objects(
+            Bucket=R2_BUCKET,
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+        )
+        for error in response.get("Errors", []):
+            print(f"Failed to delete {error['Key']}: {error.get('Message')}")
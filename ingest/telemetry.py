@@ -0,0 +1,303 @@
+import cProfile
+import functools
+import inspect
+import json
+import os
+import platform
+import resource
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from .config import R2_BUCKET, PIPELINE_PROFILE, PROFILE_DIR
+
+# Per-process run telemetry. Each stage() block appends one record with wall
+# time, RSS and whatever byte/row counts the caller fills in. S3 clients from
+# get_s3_client report every API call through botocore event hooks. At the end
+# of a run, write_report() puts the whole thing as one JSON object under
+# telemetry/ in R2.
+#
+# With PIPELINE_PROFILE=1 outermost stages also get a cProfile run and a
+# tracemalloc before/after comparison. The .prof files go to PROFILE_DIR and
+# are uploaded next to the report. Only one profiler can run at a time, so
+# stages on other threads that overlap a profiled one are timed but not profiled.
+#
+# Each record's peak_rss_mb is the highest RSS while that stage ran. On Linux
+# every stage start resets the kernel's high-water mark (VmHWM, via
+# /proc/self/clear_refs) after folding its current value into the peaks of
+# the stages still running, so a stage's peak covers its own run only. RSS is
+# per process, so overlapping stages on other threads count towards it.
+# Elsewhere records carry process_peak_rss_mb, the process-wide high-water mark
+# so far, instead.
+PROFILE_TOP = 25
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+class Run:
+    def __init__(self):
+        self.created_at = datetime.now(timezone.utc)
+        self.run_id = f"{self.created_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.started = time.perf_counter()
+        self.stages = []
+        self.s3_calls = {}
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+_run = Run()
+# cProfile can only have one active profiler at a time on recent Pythons
+_profile_lock = threading.Lock()
+# id(record) -> peak RSS seen so far for every running stage, and for the process
+_peak_lock = threading.Lock()
+_stage_peaks = {}
+_process_peak = 0.0
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024 ** 2
+    except OSError:
+        return None
+
+def _hwm_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _fold_hwm():
+    # caller holds _peak_lock; the kernel's high-water mark since the last reset
+    # counts towards every running stage and the process
+    global _process_peak
+    hwm = _hwm_mb()
+    if hwm is None:
+        return None
+    for key in _stage_peaks:
+        _stage_peaks[key] = max(_stage_peaks[key], hwm)
+    _process_peak = max(_process_peak, hwm)
+    return hwm
+
+def _start_peak(record):
+    with _peak_lock:
+        if _fold_hwm() is None or not _reset_hwm():
+            return False
+        _stage_peaks[id(record)] = 0.0
+        return True
+
+def _finish_peak(record):
+    with _peak_lock:
+        _fold_hwm()
+        return _stage_peaks.pop(id(record))
+
+def peak_rss_mb():
+    # process high-water mark so far; ru_maxrss (KB on Linux) drops with every
+    # reset, so the peaks folded in before a reset are kept separately
+    with _peak_lock:
+        _fold_hwm()
+        return max(_process_peak, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+def _start_profile():
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    snapshot = tracemalloc.take_snapshot()
+    profiler.enable()
+    return profiler, snapshot
+
+def _finish_profile(state, record):
+    profiler, before = state
+    try:
+        profiler.disable()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        run_dir = os.path.join(PROFILE_DIR, _run.run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        with _run.lock:
+            path = os.path.join(run_dir, f"{len(_run.profiles):03d}-{record['stage']}.prof")
+            _run.profiles.append(path)
+        profiler.dump_stats(path)
+
+        profiler.create_stats()
+        functions = sorted(profiler.stats.items(), key=lambda item: item[1][3], reverse=True)
+        record["profile"] = {
+            "path": path,
+            "traced_peak_mb": peak / 1024 ** 2,
+            "traced_current_mb": current / 1024 ** 2,
+            "top_functions": [
+                {"function": f"{file}:{line}({name})", "calls": calls, "tottime": tottime, "cumtime": cumtime}
+                for (file, line, name), (_, calls, tottime, cumtime, _) in functions[:PROFILE_TOP]
+            ],
+            "top_allocations": [
+                {"where": str(stat.traceback[0]), "size_diff_kb": stat.size_diff / 1024, "count_diff": stat.count_diff}
+                for stat in after.compare_to(before, "lineno")[:PROFILE_TOP]
+            ],
+        }
+    finally:
+        _profile_lock.release()
+
+@contextmanager
+def stage(name, **attrs):
+    # Yields the record so the caller can add bytes_in/bytes_out/rows_in/rows_out
+    record = {"stage": name, **attrs}
+    depth = getattr(_run.local, "depth", 0)
+    profile = _start_profile() if PIPELINE_PROFILE and depth == 0 else None
+    _run.local.depth = depth + 1
+    tracks_peak = _start_peak(record)
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        record["started_at"] = started - _run.started
+        record["thread"] = threading.current_thread().name
+        record["depth"] = depth
+        rss_after = rss_mb()
+        if rss_after is not None:
+            record["rss_mb"] = rss_after
+            record["rss_delta_mb"] = rss_after - rss_before
+        if tracks_peak:
+            record["peak_rss_mb"] = _finish_peak(record)
+        else:
+            record["process_peak_rss_mb"] = peak_rss_mb()
+        _run.local.depth = depth
+        if profile:
+            _finish_profile(profile, record)
+        with _run.lock:
+            _run.stages.append(record)
+
+def timed(name, keep=(), **metrics):
+    # Decorator form of stage(). keep names arguments to copy into the record;
+    # metrics map record fields to functions of the return value.
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            with stage(name, **{arg: bound[arg] for arg in keep if arg in bound}) as record:
+                result = func(*args, **kwargs)
+                for field, metric in metrics.items():
+                    record[field] = metric(result)
+                return result
+        return wrapper
+    return decorate
+
+def _body_size(body):
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode())
+    try:
+        # file-like bodies (upload_fileobj parts): bytes left from the current position
+        position = body.tell()
+        body.seek(0, os.SEEK_END)
+        size = body.tell() - position
+        body.seek(position)
+        return size
+    except (AttributeError, OSError, TypeError, ValueError):
+        return 0
+
+def _s3_before_call(model, params, context, **kwargs):
+    context["telemetry_started"] = time.perf_counter()
+    # params is the serialized request here, so the payload is under "body"
+    context["telemetry_bytes_out"] = _body_size(params.get("body"))
+
+def _s3_record(operation, context, status=None, bytes_in=0, error=None):
+    seconds = time.perf_counter() - context.get("telemetry_started", time.perf_counter())
+    with _run.lock:
+        calls = _run.s3_calls.setdefault(operation, {
+            "calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0, "errors": 0, "status": {}
+        })
+        calls["calls"] += 1
+        calls["seconds"] += seconds
+        calls["bytes_in"] += bytes_in
+        calls["bytes_out"] += context.get("telemetry_bytes_out", 0)
+        if status is not None:
+            calls["status"][str(status)] = calls["status"].get(str(status), 0) + 1
+        # 4xx answers (304/404/412 from conditional reads, catalog lookups) are
+        # normal here and show up under status; errors are 5xx and transport failures
+        if error or (status is not None and status >= 500):
+            calls["errors"] += 1
+
+def _s3_after_call(http_response, parsed, model, context, **kwargs):
+    # streamed bodies (GetObject) aren't read yet, so use the declared length
+    bytes_in = 0 if model.http.get("method") == "HEAD" else int(http_response.headers.get("content-length") or 0)
+    _s3_record(model.name, context, http_response.status_code, bytes_in)
+
+def _s3_after_call_error(context, exception, **kwargs):
+    operation = kwargs.get("event_name", "").rsplit(".", 1)[-1]
+    _s3_record(operation, context, error=repr(exception))
+
+def instrument_s3(client):
+    events = getattr(getattr(client, "meta", None), "events", None)
+    if events is None:
+        return client
+    events.register("before-call.s3.*", _s3_before_call)
+    events.register("after-call.s3.*", _s3_after_call)
+    events.register("after-call-error.s3.*", _s3_after_call_error)
+    return client
+
+def summarize(records):
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record["stage"], {
+            "count": 0, "seconds": 0.0, "seconds_max": 0.0, "errors": 0, "peak_rss_mb": 0.0,
+            "bytes_in": 0, "bytes_out": 0, "rows_in": 0, "rows_out": 0,
+        })
+        entry["count"] += 1
+        entry["seconds"] += record["seconds"]
+        entry["seconds_max"] = max(entry["seconds_max"], record["seconds"])
+        entry["errors"] += "error" in record
+        entry["peak_rss_mb"] = max(entry["peak_rss_mb"], record.get("peak_rss_mb", record.get("process_peak_rss_mb", 0.0)))
+        for field in ("bytes_in", "bytes_out", "rows_in", "rows_out"):
+            entry[field] += record.get(field) or 0
+    return summary
+
+def report(name):
+    with _run.lock:
+        stages = list(_run.stages)
+        s3_calls = json.loads(json.dumps(_run.s3_calls))
+    return {
+        "run_id": _run.run_id,
+        "name": name,
+        "created_at": _run.created_at.isoformat(),
+        "seconds": time.perf_counter() - _run.started,
+        "peak_rss_mb": peak_rss_mb(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "profile": PIPELINE_PROFILE,
+        "summary": summarize(stages),
+        "s3": s3_calls,
+        "stages": stages,
+    }
+
+def write_report(s3, name):
+    # telemetry/<date>/<name>-<run_id>.json, plus profiles/ when profiling
+    data = report(name)
+    prefix = f"telemetry/{_run.created_at:%Y-%m-%d}"
+    for path in _run.profiles:
+        s3.upload_file(path, R2_BUCKET, f"{prefix}/profiles/{_run.run_id}/{os.path.basename(path)}")
+    key = f"{prefix}/{name}-{_run.run_id}.json"
+    s3.put_object(Bucket=R2_BUCKET, Key=key, Body=json.dumps(data, default=str).encode(),
+                  ContentType="application/json")
+    print(f"Telemetry: {key} ({len(data['stages'])} stages, {sum(c['calls'] for c in data['s3'].values())} S3 calls)")
+    return key
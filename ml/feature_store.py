@@ -0,0 +1,186 @@
+import os
+import sys
+sys.path.append(".")
+
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from features import load_gold_days
+
+WINDOWS = (1, 3, 7, 30)
+METRICS = ["stars", "forks", "pushes"]
+STORE_DIR = os.getenv(
+    "FEATURE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_store")
+)
+
+def shift_date(date_str, days):
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+class RollingStore:
+    # Running per-repo sums and day counts of METRICS over several trailing
+    # windows of gold days. Folding in a day adds it to every window and
+    # subtracts the day that falls out of each one, so a daily update reads one
+    # gold partition no matter how long the windows are.
+    #
+    # On disk (all .npy, memory-mapped on load):
+    #   repo_ids.npy         sorted int64 repo ids, shape (R,)
+    #   sums.npy             int32 running sums, shape (len(windows), R, len(METRICS))
+    #   counts.npy           int16 days present in each window, shape (len(windows), R)
+    #   days/<date>.ids.npy, days/<date>.values.npy
+    #                        compact copy of each gold day still inside the longest
+    #                        window, needed to subtract it when it expires
+    #   meta.json            last folded date and the window lengths
+    def __init__(self, path=STORE_DIR, windows=WINDOWS):
+        self.path = path
+        self.windows = tuple(sorted(windows))
+        self.last_date = None
+        self.repo_ids = np.empty(0, dtype=np.int64)
+        self.sums = np.zeros((len(self.windows), 0, len(METRICS)), dtype=np.int32)
+        self.counts = np.zeros((len(self.windows), 0), dtype=np.int16)
+
+    @classmethod
+    def open(cls, path=STORE_DIR, windows=WINDOWS, mmap_mode="r"):
+        store = cls(path, windows)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return store
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if tuple(meta["windows"]) != store.windows or meta["metrics"] != METRICS:
+            # different layout, start over rather than mix incompatible sums
+            return store
+        store.last_date = meta["last_date"]
+        store.repo_ids = np.load(os.path.join(path, "repo_ids.npy"), mmap_mode=mmap_mode)
+        store.sums = np.load(os.path.join(path, "sums.npy"), mmap_mode=mmap_mode)
+        store.counts = np.load(os.path.join(path, "counts.npy"), mmap_mode=mmap_mode)
+        return store
+
+    def save(self):
+        os.makedirs(os.path.join(self.path, "days"), exist_ok=True)
+        for name, array in [("repo_ids", self.repo_ids), ("sums", self.sums), ("counts", self.counts)]:
+            tmp_path = os.path.join(self.path, f"{name}.tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(self.path, f"{name}.npy"))
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"last_date": self.last_date, "windows": self.windows, "metrics": METRICS}, f)
+
+    def reset(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.__init__(self.path, self.windows)
+
+    def _day_paths(self, date_str):
+        base = os.path.join(self.path, "days", date_str)
+        return f"{base}.ids.npy", f"{base}.values.npy"
+
+    def _load_day(self, date_str):
+        ids_path, values_path = self._day_paths(date_str)
+        if not os.path.exists(ids_path):
+            return None
+        return np.load(ids_path, mmap_mode="r"), np.load(values_path, mmap_mode="r")
+
+    def _ensure_repos(self, ids):
+        new_ids = np.setdiff1d(ids, self.repo_ids, assume_unique=True)
+        if not len(new_ids):
+            return
+        merged = np.union1d(self.repo_ids, new_ids)
+        old_pos = np.searchsorted(merged, self.repo_ids)
+        sums = np.zeros((len(self.windows), len(merged), len(METRICS)), dtype=np.int32)
+        counts = np.zeros((len(self.windows), len(merged)), dtype=np.int16)
+        sums[:, old_pos] = self.sums
+        counts[:, old_pos] = self.counts
+        self.repo_ids, self.sums, self.counts = merged, sums, counts
+
+    def _advance(self, date_str, gold=None):
+        # gold=None means the day is missing; it still moves every window forward
+        if isinstance(self.sums, np.memmap):
+            self.repo_ids, self.sums, self.counts = (
+                np.array(self.repo_ids), np.array(self.sums), np.array(self.counts)
+            )
+
+        if gold is not None and len(gold):
+            gold = gold.sort_values("repo_id")
+            ids = gold["repo_id"].to_numpy(dtype=np.int64)
+            values = gold[METRICS].to_numpy(dtype=np.int32)
+            ids_path, values_path = self._day_paths(date_str)
+            os.makedirs(os.path.dirname(ids_path), exist_ok=True)
+            np.save(ids_path, ids)
+            np.save(values_path, values)
+
+            self._ensure_repos(ids)
+            pos = np.searchsorted(self.repo_ids, ids)
+            self.sums[:, pos] += values
+            self.counts[:, pos] += 1
+
+        for w, window in enumerate(self.windows):
+            expired = self._load_day(shift_date(date_str, -window))
+            if expired is None:
+                continue
+            pos = np.searchsorted(self.repo_ids, expired[0])
+            self.sums[w, pos] -= expired[1]
+            self.counts[w, pos] -= 1
+
+        oldest = shift_date(date_str, -self.windows[-1])
+        for day_path in self._day_paths(oldest):
+            if os.path.exists(day_path):
+                os.remove(day_path)
+
+        # repos with no activity in the longest window carry no information
+        keep = self.counts[-1] > 0
+        if not keep.all():
+            self.repo_ids, self.sums, self.counts = self.repo_ids[keep], self.sums[:, keep], self.counts[:, keep]
+        self.last_date = date_str
+
+    def fold(self, date_str, gold):
+        if self.last_date is not None and date_str <= self.last_date:
+            raise ValueError(f"{date_str} is not after the last folded day {self.last_date}")
+        if self.last_date is not None:
+            day = shift_date(self.last_date, 1)
+            while day < date_str:
+                self._advance(day)
+                day = shift_date(day, 1)
+        self._advance(date_str, gold)
+
+    def sync(self, s3, through_date, loader=load_gold_days):
+        # Folds every gold day up to through_date. A store that is empty or
+        # further behind than the longest window is rebuilt from scratch, and so
+        # is one already past through_date: its windows would include later
+        # days (e.g. the target day itself), which leaks into the features.
+        first_needed = shift_date(through_date, -self.windows[-1] + 1)
+        if self.last_date is None or self.last_date < shift_date(first_needed, -1) or self.last_date > through_date:
+            if self.last_date is not None and self.last_date > through_date:
+                print(f"Feature store is at {self.last_date}, past {through_date}; rebuilding")
+            self.reset()
+            day = first_needed
+        elif self.last_date == through_date:
+            return self
+        else:
+            day = shift_date(self.last_date, 1)
+
+        days = []
+        while day <= through_date:
+            days.append(day)
+            day = shift_date(day, 1)
+        golds = loader(s3, days)
+        for day in days:
+            self.fold(day, golds.get(day))
+            print(f"Feature store: folded {day}" + ("" if day in golds else " (missing)"))
+        self.save()
+        return self
+
+    def window_features(self, windows=None):
+        # avg_<metric>_<w>d is the mean over the days the repo appeared in gold
+        # within the window, matching the old groupby mean over past partitions
+        features = {"repo_id": np.asarray(self.repo_ids)}
+        for window in windows or self.windows:
+            w = self.windows.index(window)
+            counts = np.asarray(self.counts[w], dtype=np.float64)
+            active = counts > 0
+            for m, metric in enumerate(METRICS):
+                means = np.full(len(counts), np.nan)
+                means[active] = self.sums[w, active, m] / counts[active]
+                features[f"avg_{metric}_{window}d"] = means
+        df = pd.DataFrame(features)
+        return df.dropna(how="all", subset=df.columns[1:])
@@ -1,16 +1,25 @@
 import sys
 sys.path.append(".")
 
+import numpy as np
 import pandas as pd
 from io import BytesIO
 from datetime import datetime, timedelta
 from ingest.config import get_s3_client, R2_BUCKET
+from ingest.cache import read_partition, read_partitions
+from ingest.storage import gold_key
 
 def load_gold_day(s3, date):
-    year, month, day = date.split("-")
-    key = f"gold/year={year}/month={month}/day={day}/metrics.parquet"
-    response = s3.get_object(Bucket=R2_BUCKET, Key=key)
-    return pd.read_parquet(BytesIO(response["Body"].read()))
+    return read_partition(s3, gold_key(date)).to_pandas()
+
+def load_gold_days(s3, dates):
+    # concurrent, cached fetch of several days; days without a gold partition are left out
+    tables = read_partitions(s3, [gold_key(date) for date in dates])
+    return {
+        date: tables[gold_key(date)].to_pandas()
+        for date in dates
+        if tables[gold_key(date)] is not None
+    }
 
 def build_features(target_date):
     s3 = get_s3_client()
@@ -18,13 +27,8 @@ def build_features(target_date):
     
     today = load_gold_day(s3, target_date)
     
-    past_7_days = []
-    for i in range(1, 8):
-        past_date = (target - timedelta(days=i)).strftime("%Y-%m-%d")
-        try:
-            past_7_days.append(load_gold_day(s3, past_date))
-        except:
-            pass
+    past_dates = [(target - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(1, 8)]
+    past_7_days = list(load_gold_days(s3, past_dates).values())
     
     if not past_7_days:
         raise ValueError("No historical data available")
@@ -48,6 +52,64 @@ def build_features(target_date):
     
     return features
 
+def build_feature_panel(s3, target_dates, window=7):
+    # Same output as concatenating build_features(date) for every target date,
+    # but each gold day is loaded once and the trailing averages for all
+    # targets come from one vectorized pass over a (repo, day) panel.
+    targets = sorted(target_dates)
+    start = datetime.strptime(targets[0], "%Y-%m-%d") - timedelta(days=window)
+    end = datetime.strptime(targets[-1], "%Y-%m-%d")
+    all_dates = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+    golds = load_gold_days(s3, all_dates)
+    if not golds:
+        raise ValueError("No gold data available")
+    
+    # dense day axis: day number i for all_dates[i], offset by the window so
+    # day - window never goes below zero
+    day_of = {date: i + window for i, date in enumerate(all_dates)}
+    panel = pd.concat(
+        [df.assign(date=date) for date, df in golds.items()],
+        ignore_index=True
+    )
+    days = panel["date"].map(day_of).to_numpy(dtype=np.int64)
+    repo_codes = pd.factorize(panel["repo_id"])[0].astype(np.int64)
+    span = len(all_dates) + window + 1
+    
+    # sort by (repo, day); per-repo windows become contiguous ranges, found
+    # with searchsorted on the combined key, summed with a cumulative sum
+    keys = repo_codes * span + days
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    metrics = ["stars", "forks", "pushes"]
+    values = panel[metrics].to_numpy(dtype=np.float64)[order]
+    cumsum = np.vstack([np.zeros((1, len(metrics))), np.cumsum(values, axis=0)])
+    
+    is_target = panel["date"].isin(targets).to_numpy()
+    target_keys = keys[is_target]
+    lo = np.searchsorted(sorted_keys, target_keys - window, side="left")
+    hi = np.searchsorted(sorted_keys, target_keys, side="left")
+    counts = (hi - lo)[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, (cumsum[hi] - cumsum[lo]) / counts, 0.0)
+    
+    features = panel[is_target].reset_index(drop=True)
+    for m, metric in enumerate(metrics):
+        features[f"avg_{metric}_{window}d"] = means[:, m]
+    
+    # build_features raises for a target with no history at all; skip those here
+    has_history = {
+        date for date in targets
+        if any(past in golds for past in all_dates[day_of[date] - 2 * window:day_of[date] - window])
+    }
+    features = features[features["date"].isin(has_history)]
+    features = features.sort_values("date", kind="stable").reset_index(drop=True)
+    
+    features["star_velocity"] = features["stars"] / (features[f"avg_stars_{window}d"] + 1)
+    features["fork_ratio"] = features["forks"] / (features["stars"] + 1)
+    features["activity_score"] = features["pushes"] + features["prs"] + features["issues"]
+    
+    return features
+
 if __name__ == "__main__":
     s3 = get_s3_client()
     all_features = []
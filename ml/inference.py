@@ -0,0 +1,85 @@
+import numpy as np
+
+INFERENCE_CHUNK_ROWS = 65536
+
+ACTIVATIONS = {
+    "identity": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "tanh": np.tanh,
+    "logistic": lambda x: 1 / (1 + np.exp(-x)),
+}
+
+def export_mlp(model, scaler, path):
+    # Saves a fitted MinMaxScaler + MLPClassifier as plain float32 arrays.
+    # The scaler is affine (x * scale_ + min_), so it folds into the first
+    # layer: (x * s + m) @ W + b == x @ (s[:, None] * W) + (m @ W + b)
+    if getattr(scaler, "clip", False):
+        raise ValueError("MinMaxScaler(clip=True) can't be folded into the first layer")
+
+    weights = [np.asarray(w, dtype=np.float64) for w in model.coefs_]
+    biases = [np.asarray(b, dtype=np.float64) for b in model.intercepts_]
+    biases[0] = scaler.min_ @ weights[0] + biases[0]
+    weights[0] = scaler.scale_[:, None] * weights[0]
+
+    arrays = {
+        "activation": np.array(model.activation),
+        "out_activation": np.array(model.out_activation_),
+        "classes": np.asarray(model.classes_),
+    }
+    for i, (w, b) in enumerate(zip(weights, biases)):
+        arrays[f"W{i}"] = w.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+    np.savez(path, **arrays)
+    return path
+
+class NumpyMLP:
+    # float32 forward pass over an export_mlp artifact; takes raw (unscaled) features
+    def __init__(self, weights, biases, activation, out_activation, classes):
+        self.weights = weights
+        self.biases = biases
+        self.activation = activation
+        self.out_activation = out_activation
+        self.classes_ = classes
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            layers = sum(1 for name in data.files if name.startswith("W"))
+            return cls(
+                [data[f"W{i}"] for i in range(layers)],
+                [data[f"b{i}"] for i in range(layers)],
+                str(data["activation"]),
+                str(data["out_activation"]),
+                data["classes"],
+            )
+
+    def _forward(self, X):
+        hidden = ACTIVATIONS[self.activation]
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            X = X @ w
+            X += b
+            if i < len(self.weights) - 1:
+                X = hidden(X)
+        if self.out_activation == "softmax":
+            X = np.exp(X - X.max(axis=1, keepdims=True))
+            return X / X.sum(axis=1, keepdims=True)
+        p = ACTIVATIONS[self.out_activation](X)
+        return np.hstack([1 - p, p])
+
+    def predict_proba(self, X, chunk_rows=INFERENCE_CHUNK_ROWS):
+        # X can be a DataFrame or array; only one chunk is converted to float32 at a time
+        X = X.to_numpy() if hasattr(X, "to_numpy") else np.asarray(X)
+        out = np.empty((len(X), max(len(self.classes_), 2)), dtype=np.float32)
+        for start in range(0, len(X), chunk_rows):
+            chunk = np.asarray(X[start:start + chunk_rows], dtype=np.float32)
+            out[start:start + chunk_rows] = self._forward(chunk)
+        return out
+
+def check_parity(model, scaler, engine, X, atol=1e-4):
+    # max |p_sklearn - p_numpy| on X, raises if the export drifted
+    expected = model.predict_proba(scaler.transform(X))
+    actual = engine.predict_proba(X)
+    diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    if diff > atol:
+        raise ValueError(f"NumPy inference differs from sklearn by {diff:.2e} (atol {atol:.0e})")
+    return diff
@@ -1,56 +1,64 @@
 import sys
 sys.path.append(".")
 
+import numpy as np
 import pandas as pd
 from io import BytesIO
-from datetime import timedelta
+from datetime import datetime
 from ingest.config import get_s3_client, R2_BUCKET
-from features import load_gold_day
+from features import load_gold_days
 
-def add_labels_vectorized(features_df, s3):
-    future_days = []
-    for day in range(9, 19):
-        date_str = f"2025-12-{day:02d}"
-        try:
-            df = load_gold_day(s3, date_str)
-            df["future_date"] = date_str
-            future_days.append(df[["repo_id", "stars", "future_date"]])
-        except:
-            pass
-    print(f"Loaded {len(future_days)} future days")
-    
-    all_future = pd.concat(future_days)
-    all_future = all_future.rename(columns={"stars": "future_stars"})
-    
-    features_df["day1"] = pd.to_datetime(features_df["date"]) + timedelta(days=1)
-    features_df["day2"] = pd.to_datetime(features_df["date"]) + timedelta(days=2)
-    features_df["day1"] = features_df["day1"].dt.strftime("%Y-%m-%d")
-    features_df["day2"] = features_df["day2"].dt.strftime("%Y-%m-%d")
-    
-    day1_stars = features_df.merge(
-        all_future, 
-        left_on=["repo_id", "day1"], 
-        right_on=["repo_id", "future_date"], 
-        how="left"
-    )[["future_stars"]].fillna(0)
+def day_numbers(dates):
+    # integer day offsets for a column of YYYY-MM-DD strings, parsing each distinct date once
+    codes, uniques = pd.factorize(pd.Series(dates))
+    ordinals = np.array([datetime.strptime(date, "%Y-%m-%d").toordinal() for date in uniques], dtype=np.int64)
+    return ordinals[codes]
+
+def forward_star_sums(features_df, future_days, horizons=(2,)):
+    # For each feature row, the stars its repo gets on the next h days, for every
+    # h in horizons. future_days maps date -> gold frame. Lookups go through one
+    # sorted (repo_id, day) key array, so nothing is merged or copied per horizon.
+    future_ordinals = {date: datetime.strptime(date, "%Y-%m-%d").toordinal() for date in future_days}
+    feature_days = day_numbers(features_df["date"])
+    max_horizon = max(horizons)
+    # key = repo_id * span + (day - origin); span leaves room for every queried day
+    origin = min(int(feature_days.min()), min(future_ordinals.values()))
+    span = max(int(feature_days.max()) + max_horizon, max(future_ordinals.values())) - origin + 1
     
-    day2_stars = features_df.merge(
-        all_future, 
-        left_on=["repo_id", "day2"], 
-        right_on=["repo_id", "future_date"], 
-        how="left"
-    )[["future_stars"]].fillna(0)
+    future_keys = np.concatenate([
+        df["repo_id"].to_numpy(dtype=np.int64) * span + (future_ordinals[date] - origin)
+        for date, df in future_days.items()
+    ])
+    future_stars = np.concatenate([df["stars"].to_numpy(dtype=np.int64) for df in future_days.values()])
+    order = np.argsort(future_keys)
+    future_keys, future_stars = future_keys[order], future_stars[order]
     
-    features_df["future_stars"] = day1_stars["future_stars"].values + day2_stars["future_stars"].values
-    features_df["viral"] = (features_df["future_stars"] >= 20).astype(int)
+    base_keys = features_df["repo_id"].to_numpy(dtype=np.int64) * span + (feature_days - origin)
+    running = np.zeros(len(features_df), dtype=np.int64)
+    sums = {}
+    for offset in range(1, max_horizon + 1):
+        query = base_keys + offset
+        idx = np.minimum(np.searchsorted(future_keys, query), len(future_keys) - 1)
+        running += np.where(future_keys[idx] == query, future_stars[idx], 0)
+        if offset in horizons:
+            sums[offset] = running.copy()
+    return sums
+
+def add_labels(features_df, future_days, horizon=2):
+    future_stars = forward_star_sums(features_df, future_days, [horizon])[horizon]
+    features_df["viral"] = (future_stars >= 20).astype(int)
     features_df["trending"] = (
-        (features_df["future_stars"] >= features_df["avg_stars_7d"] * 3) & 
-        (features_df["future_stars"] >= 5)
+        (future_stars >= features_df["avg_stars_7d"].to_numpy() * 3) & 
+        (future_stars >= 5)
     ).astype(int)
-    features_df = features_df.drop(columns=["future_stars", "day1", "day2"])
-    
     return features_df
 
+def add_labels_vectorized(features_df, s3):
+    dates = [f"2025-12-{day:02d}" for day in range(9, 19)]
+    future_days = load_gold_days(s3, dates)
+    print(f"Loaded {len(future_days)} future days")
+    return add_labels(features_df, future_days)
+
 if __name__ == "__main__":
     s3 = get_s3_client()
     
@@ -2,18 +2,44 @@ import os
 import sys
 sys.path.append(".")
 
+import argparse
+import json
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import joblib
 import glob
 from io import BytesIO
 from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
 from ingest.config import get_s3_client, R2_BUCKET
+from ingest.cache import read_partition, read_partitions
+from ingest.catalog import load_catalog
+from ingest.storage import put_objects
+from ingest.telemetry import stage, timed, write_report
 from features import load_gold_day
+from feature_store import RollingStore, shift_date
+from inference import NumpyMLP
+from registry import get_current, fetch_artifacts
 
 feature_cols = ["stars", "forks", "pushes", "prs", "issues",
                 "avg_stars_7d", "avg_forks_7d", "avg_pushes_7d",
                 "star_velocity", "fork_ratio"]
 
+# The dashboard only shows repos above its probability slider minimum, so the
+# serving artifact keeps the top SERVING_TOP_N of those per label plus the
+# columns the cards use; summary.json has the exact counts for the full set.
+SERVING_COLUMNS = ["repo_id", "repo_name", "stars", "forks", "star_velocity",
+                   "viral_prob", "trending_prob", "github_url"]
+SERVING_LABELS = ["viral_prob", "trending_prob"]
+SERVING_TOP_N = 5000
+SERVING_MIN_PROB = 0.5
+SERVING_ROW_GROUP_SIZE = 1024
+SUMMARY_THRESHOLDS = [round(0.5 + i / 100, 2) for i in range(50)]
+# every repo scored so far for a partial day, with the hours it covers in its metadata
+PARTIAL_PREDICTIONS_KEY = "predictions/partial/{date}.parquet"
+
 def get_latest_model(script_dir):
     model_files = glob.glob(os.path.join(script_dir, "model_viral_*.pkl"))
     
@@ -29,50 +55,115 @@ def get_latest_model(script_dir):
     
     return latest_model, latest_scaler
 
-def build_features(s3, target_date):
-    target = datetime.strptime(target_date, "%Y-%m-%d")
+def load_scorer(model_path, scaler_path, inference_path=None):
+    # prefer the NumPy export next to the pickle: float32, chunked, no sklearn import
+    inference_path = inference_path or model_path[:-len(".pkl")] + ".npz"
+    if os.path.exists(inference_path):
+        print(f"Using NumPy inference: {inference_path}")
+        return NumpyMLP.load(inference_path).predict_proba
     
-    today = load_gold_day(s3, target_date)
+    model = joblib.load(model_path, mmap_mode="r")
+    scaler = joblib.load(scaler_path, mmap_mode="r")
+    return lambda X: model.predict_proba(scaler.transform(X))
+
+def load_current_model(s3, script_dir):
+    # One GET of models/current.json; artifacts come from the local hash-named
+    # cache. Falls back to the models committed in ml/ until one is registered.
+    current = get_current(s3)
+    if current is None:
+        model_path, scaler_path = get_latest_model(script_dir)
+        print(f"No registered model, using {model_path}")
+        return load_scorer(model_path, scaler_path), feature_cols
     
-    past_7_days = []
-    for i in range(1, 8):
-        past_date = (target - timedelta(days=i)).strftime("%Y-%m-%d")
-        try:
-            past_7_days.append(load_gold_day(s3, past_date))
-        except:
-            pass
+    manifest = current["manifest"]
+    paths = fetch_artifacts(s3, manifest)
+    print(f"Using registered model {manifest['version']}")
+    return load_scorer(paths["model"], paths["scaler"], paths.get("inference")), manifest["feature_cols"]
+
+def add_window_features(s3, today, target_date, store=None, through_date=None):
+    # the rolling store only has to fold in the gold days it hasn't seen yet
+    store = store or RollingStore.open()
+    store.sync(s3, through_date or shift_date(target_date, -1))
+    avg_stats = store.window_features([7])
     
-    if not past_7_days:
+    if avg_stats.empty:
         raise ValueError("No historical data available")
     
-    history = pd.concat(past_7_days)
-    avg_stats = history.groupby("repo_id").agg({
-        "stars": "mean",
-        "forks": "mean",
-        "pushes": "mean"
-    }).rename(columns={
-        "stars": "avg_stars_7d",
-        "forks": "avg_forks_7d",
-        "pushes": "avg_pushes_7d"
-    })
-    
     features = today.merge(avg_stats, on="repo_id", how="left").fillna(0)
     features["star_velocity"] = features["stars"] / (features["avg_stars_7d"] + 1)
     features["fork_ratio"] = features["forks"] / (features["stars"] + 1)
     
     return features
 
+@timed("build_features", keep=("target_date",), rows_out=len)
+def build_features(s3, target_date, store=None):
+    return add_window_features(s3, load_gold_day(s3, target_date), target_date, store)
+
+def score_features(features, score_viral, model_cols):
+    X = features[model_cols]
+    
+    with stage("score_model", rows_in=len(X)):
+        features["viral_prob"] = score_viral(X)[:, 1]
+    features["viral_pred"] = (features["viral_prob"] >= 0.7).astype(int)
+    
+    features["github_url"] = "https://github.com/" + features["repo_name"]
+    return features
+
+def publish_predictions(s3, features, date):
+    top_viral = features.sort_values("viral_prob", ascending=False)
+    
+    buffer = BytesIO()
+    top_viral.to_parquet(buffer, index=False)
+    
+    # the three objects are independent, so they go up concurrently
+    objects, serving_rows = serving_artifacts(features, date)
+    put_objects(s3, {"predictions/latest.parquet": buffer.getvalue(), **objects})
+    
+    print(f"Saved {len(top_viral)} repos to predictions/latest.parquet")
+    print(f"Saved {serving_rows} repos to predictions/serving.parquet")
+    print(f"Viral (prob >= 0.7): {features['viral_pred'].sum()}")
+
+def count_at_thresholds(probs, thresholds=SUMMARY_THRESHOLDS):
+    probs = np.sort(np.asarray(probs))
+    below = np.searchsorted(probs, thresholds, side="left")
+    return {f"{t:.2f}": int(len(probs) - n) for t, n in zip(thresholds, below)}
+
+def serving_artifacts(features, date):
+    labels = [label for label in SERVING_LABELS if label in features.columns]
+    columns = [column for column in SERVING_COLUMNS if column in features.columns]
+    
+    keep = pd.Index([])
+    for label in labels:
+        eligible = features[features[label] >= SERVING_MIN_PROB]
+        keep = keep.union(eligible.nlargest(SERVING_TOP_N, label).index)
+    serving = features.loc[keep, columns].sort_values("viral_prob", ascending=False)
+    
+    # sorted by viral_prob with small row groups, so min/max stats let readers skip groups
+    buffer = BytesIO()
+    pq.write_table(pa.Table.from_pandas(serving, preserve_index=False), buffer,
+                   row_group_size=SERVING_ROW_GROUP_SIZE, compression="zstd")
+    
+    summary = {
+        "date": date,
+        "total_repos_analyzed": len(features),
+        "max_stars": int(features["stars"].max()),
+        "max_forks": int(features["forks"].max()),
+        "top_n": SERVING_TOP_N,
+        "counts": {label: count_at_thresholds(features[label]) for label in labels},
+    }
+    if "trending_prob" in features.columns:
+        summary["counts"]["hot"] = count_at_thresholds(features[["viral_prob", "trending_prob"]].min(axis=1))
+    objects = {
+        "predictions/serving.parquet": buffer.getvalue(),
+        "predictions/summary.json": {"Body": json.dumps(summary).encode(), "ContentType": "application/json"},
+    }
+    return objects, len(serving)
+
 def make_predictions():
     s3 = get_s3_client()
     
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    model_path, scaler_path = get_latest_model(script_dir)
-    
-    print(f"Using model: {model_path}")
-    print(f"Using scaler: {scaler_path}")
-    
-    model_viral = joblib.load(model_path)
-    scaler_viral = joblib.load(scaler_path)
+    score_viral, model_cols = load_current_model(s3, script_dir)
     
     today = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
 
@@ -81,23 +172,86 @@ def make_predictions():
     features = build_features(s3, today)
     print(f"Features built for {len(features)} repos")
     
-    X = features[feature_cols]
+    features = score_features(features, score_viral, model_cols)
+    publish_predictions(s3, features, today)
+
+def load_partial_predictions(s3, date):
+    try:
+        table = read_partition(s3, PARTIAL_PREDICTIONS_KEY.format(date=date))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None, []
+        raise
+    return table.to_pandas(), json.loads(table.schema.metadata.get(b"hours", b"[]"))
+
+def make_hourly_predictions():
+    # Scores the day in progress from the running aggregate that ingest/hourly.py
+    # maintains. Only repos active in hours not scored yet have new counts, so
+    # only those are re-scored; everyone else keeps their earlier score.
+    s3 = get_s3_client()
+    catalog, _ = load_catalog(s3, "hourly")
+    partitions = (catalog or {"partitions": {}})["partitions"]
+    dates = [date for date, entry in partitions.items() if (entry.get("partial") or {}).get("hours")]
+    if not dates:
+        print("No hourly aggregates yet")
+        return None
+    date = max(dates)
+    entry = partitions[date]
+    partial = entry["partial"]
     
-    X_viral = scaler_viral.transform(X)
-    features["viral_prob"] = model_viral.predict_proba(X_viral)[:, 1]
-    features["viral_pred"] = (features["viral_prob"] >= 0.7).astype(int)
+    previous, scored_hours = load_partial_predictions(s3, date)
+    new_hours = sorted(set(partial["hours"]) - set(scored_hours))
+    if not new_hours:
+        print(f"{date}: hours {partial['hours']} already scored")
+        return previous
     
-    features["github_url"] = "https://github.com/" + features["repo_name"]
+    hour_keys = {hour: entry["hours"][f"{hour:02d}"]["key"] for hour in new_hours}
+    tables = read_partitions(s3, list(hour_keys.values()), ["repo_id"])
+    # an hour file that can't be read leaves its repos unknown, so the hour
+    # stays unscored and is picked up again by the next run
+    unread = [hour for hour, key in hour_keys.items() if tables[key] is None]
+    if unread:
+        print(f"{date}: hourly files missing for hours {unread}, leaving them unscored")
+        new_hours = [hour for hour in new_hours if hour not in unread]
+        if not new_hours:
+            return previous
+    changed = pd.concat([tables[hour_keys[hour]]["repo_id"].to_pandas() for hour in new_hours])
+    counts = read_partition(s3, partial["key"], repo_ids=changed.unique()).to_pandas()
+    counts["date"] = date
+    print(f"{date}: re-scoring {len(counts)} repos active in hours {new_hours}")
     
-    top_viral = features.sort_values("viral_prob", ascending=False)
+    # windows end at the newest finalized gold day before this one
+    gold_catalog, _ = load_catalog(s3, "gold")
+    gold_dates = [day for day in (gold_catalog or {"partitions": {}})["partitions"] if day < date]
+    if not gold_dates:
+        raise ValueError("No gold history to build window features from")
+    through_date = max(gold_dates)
+    if through_date < shift_date(date, -1):
+        print(f"Window features end at {through_date}, {shift_date(date, -1)} isn't in gold yet")
+    
+    score_viral, model_cols = load_current_model(s3, os.path.dirname(os.path.abspath(__file__)))
+    features = add_window_features(s3, counts, date, through_date=through_date)
+    features = score_features(features, score_viral, model_cols)
+    if previous is not None:
+        features = pd.concat([previous[~previous["repo_id"].isin(changed)], features], ignore_index=True)
     
+    hours = sorted(set(scored_hours) | set(new_hours))
+    table = pa.Table.from_pandas(features, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"hours": json.dumps(hours).encode()})
     buffer = BytesIO()
-    top_viral.to_parquet(buffer, index=False)
-    buffer.seek(0)
-    s3.put_object(Bucket=R2_BUCKET, Key="predictions/latest.parquet", Body=buffer.getvalue())
+    pq.write_table(table, buffer)
+    s3.put_object(Bucket=R2_BUCKET, Key=PARTIAL_PREDICTIONS_KEY.format(date=date), Body=buffer.getvalue())
     
-    print(f"Saved {len(top_viral)} repos to predictions/latest.parquet")
-    print(f"Viral (prob >= 0.7): {features['viral_pred'].sum()}")
+    publish_predictions(s3, features, date)
+    return features
 
 if __name__ == "__main__":
-    make_predictions()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Score repos and publish predictions")
+    parser.add_argument("--hourly", action="store_true",
+                        help="Re-score the day in progress from the hourly aggregate")
+    args = parser.parse_args()
+    if args.hourly:
+        make_hourly_predictions()
+    else:
+        make_predictions()
+    write_report(get_s3_client(), "predict_hourly" if args.hourly else "predict")
\ No newline at end of file
@@ -0,0 +1,169 @@
+import os
+import sys
+sys.path.append(".")
+
+import argparse
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from ingest.config import get_s3_client, R2_BUCKET, MODEL_CACHE_DIR
+from ingest.catalog import load_json, update_json
+
+# Model registry in R2:
+#   models/blobs/<sha256><ext>       artifact bytes, named by content hash (written once)
+#   models/versions/<version>.json   manifest: artifact hashes/keys, feature list,
+#                                    metrics and the dates the model was trained on
+#   models/current.json              {"version", "manifest", "history"}, the promoted
+#                                    version with its manifest inlined so predict needs
+#                                    one GET; history holds earlier promotions for rollback
+# Promotion and rollback only rewrite current.json (If-Match guarded); blobs and
+# manifests are immutable, so a local copy keyed by hash is always valid.
+BLOB_KEY = "models/blobs/{sha256}{ext}"
+VERSION_KEY = "models/versions/{version}.json"
+CURRENT_KEY = "models/current.json"
+HISTORY_LIMIT = 20
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def upload_artifact(s3, path):
+    sha256 = sha256_file(path)
+    key = BLOB_KEY.format(sha256=sha256, ext=os.path.splitext(path)[1])
+    try:
+        s3.head_object(Bucket=R2_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") != 404:
+            raise
+        s3.upload_file(path, R2_BUCKET, key)
+    return {"key": key, "sha256": sha256, "bytes": os.path.getsize(path)}
+
+def register_version(s3, artifacts, feature_cols, metrics=None, train_dates=None):
+    # artifacts: {"model": path, "scaler": path, "inference": path}; the
+    # inference entry (NumPy export) is optional
+    entries = {name: upload_artifact(s3, path) for name, path in artifacts.items()}
+    created_at = datetime.now(timezone.utc)
+    version = f"{created_at:%Y%m%d%H%M%S}-{entries['model']['sha256'][:12]}"
+    manifest = {
+        "version": version,
+        "created_at": created_at.isoformat(),
+        "artifacts": entries,
+        "feature_cols": list(feature_cols),
+        "metrics": metrics or {},
+        "train_dates": train_dates or {},
+    }
+    s3.put_object(Bucket=R2_BUCKET, Key=VERSION_KEY.format(version=version),
+                  Body=json.dumps(manifest, sort_keys=True).encode(),
+                  ContentType="application/json", IfNoneMatch="*")
+    print(f"Registered model {version}")
+    return manifest
+
+def load_manifest(s3, version):
+    manifest, _ = load_json(s3, VERSION_KEY.format(version=version))
+    if manifest is None:
+        raise ValueError(f"Unknown model version {version}")
+    return manifest
+
+def list_versions(s3):
+    versions = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=R2_BUCKET, Prefix="models/versions/"):
+        for obj in page.get("Contents", []):
+            versions.append(obj["Key"].rsplit("/", 1)[1][:-len(".json")])
+    return sorted(versions)
+
+def get_current(s3):
+    current, _ = load_json(s3, CURRENT_KEY)
+    return current
+
+def promote(s3, version):
+    manifest = load_manifest(s3, version)
+
+    def update(current):
+        if current.get("version") == version:
+            return
+        if current.get("version"):
+            current["history"] = (current.get("history", []) + [current["version"]])[-HISTORY_LIMIT:]
+        current["version"] = version
+        current["manifest"] = manifest
+    update_json(s3, CURRENT_KEY, update, lambda: {"history": []})
+    print(f"Promoted model {version}")
+    return manifest
+
+def rollback(s3):
+    # update may run again if current.json changed underneath; manifests are immutable
+    manifests = {}
+
+    def update(current):
+        if not current.get("history"):
+            raise ValueError("No earlier model version to roll back to")
+        version = current["history"][-1]
+        if version not in manifests:
+            manifests[version] = load_manifest(s3, version)
+        current["history"] = current["history"][:-1]
+        current["version"] = version
+        current["manifest"] = manifests[version]
+    current = update_json(s3, CURRENT_KEY, update, lambda: {"history": []})
+    print(f"Rolled back to model {current['version']}")
+    return current["manifest"]
+
+_fetch_lock = threading.Lock()
+
+def fetch_artifacts(s3, manifest, cache_dir=MODEL_CACHE_DIR):
+    # Returns {name: local path}. Files are named by hash, so one already in the
+    # cache is used as is; downloads are verified before they're moved into place.
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = {}
+    for name, entry in manifest["artifacts"].items():
+        path = os.path.join(cache_dir, os.path.basename(entry["key"]))
+        with _fetch_lock:
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                s3.download_file(R2_BUCKET, entry["key"], tmp_path)
+                if sha256_file(tmp_path) != entry["sha256"]:
+                    os.remove(tmp_path)
+                    raise ValueError(f"Checksum mismatch for {entry['key']}")
+                os.replace(tmp_path, path)
+        paths[name] = path
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage registered models in R2")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List registered versions")
+    promote_parser = commands.add_parser("promote", help="Point current.json at a version")
+    promote_parser.add_argument("version")
+    commands.add_parser("rollback", help="Go back to the previously promoted version")
+    register_parser = commands.add_parser("register-local", help="Register the models committed in ml/")
+    register_parser.add_argument("--promote", action="store_true")
+    args = parser.parse_args()
+
+    s3 = get_s3_client()
+    if args.command == "list":
+        current = get_current(s3) or {}
+        for version in list_versions(s3):
+            print(("* " if version == current.get("version") else "  ") + version)
+    elif args.command == "promote":
+        promote(s3, args.version)
+    elif args.command == "rollback":
+        rollback(s3)
+    elif args.command == "register-local":
+        from predict import feature_cols
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        artifacts = {
+            "model": os.path.join(script_dir, "model_viral.pkl"),
+            "scaler": os.path.join(script_dir, "scaler_viral.pkl"),
+            "inference": os.path.join(script_dir, "model_viral.npz"),
+        }
+        artifacts = {name: path for name, path in artifacts.items() if os.path.exists(path)}
+        manifest = register_version(s3, artifacts, feature_cols)
+        if args.promote:
+            promote(s3, manifest["version"])
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,95 @@
 import sys
 sys.path.append(".")
 
+import argparse
 import pandas as pd
 import joblib
 import os
-from io import BytesIO
+import tempfile
 from datetime import datetime, timedelta, timezone
 from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import f1_score
-from ingest.config import get_s3_client, R2_BUCKET
-from features import load_gold_day, build_features
+from ingest.config import get_s3_client
+from ingest.catalog import list_partitions, remove_partitions
+from ingest.storage import delete_keys
+from ingest.telemetry import write_report
+from features import load_gold_days, build_feature_panel
+from labels import add_labels
+from inference import NumpyMLP, export_mlp, check_parity
+from registry import register_version, promote, get_current
+from tournament import CANDIDATES, run_tournament, score
+from predict import load_current_model
 
 feature_cols = ["stars", "forks", "pushes", "prs", "issues",
                 "avg_stars_7d", "avg_forks_7d", "avg_pushes_7d",
                 "star_velocity", "fork_ratio"]
 
 def get_available_dates(s3):
-    response = s3.list_objects_v2(Bucket=R2_BUCKET, Prefix="gold/")
-    dates = []
-    for obj in response.get("Contents", []):
-        key = obj["Key"]
-        if "metrics.parquet" in key:
-            parts = key.split("/")
-            year = parts[1].split("=")[1]
-            month = parts[2].split("=")[1]
-            day = parts[3].split("=")[1]
-            dates.append(f"{year}-{month}-{day}")
-    return sorted(dates)
+    return sorted(list_partitions(s3, "gold", "metrics.parquet"))
 
 def add_labels_vectorized(features_df, s3, available_dates):
-    future_days = []
-    for date_str in available_dates:
-        try:
-            df = load_gold_day(s3, date_str)
-            df["future_date"] = date_str
-            future_days.append(df[["repo_id", "stars", "future_date"]])
-        except:
-            pass
+    future_days = load_gold_days(s3, available_dates)
     
     if not future_days:
         raise ValueError("No future days available for labeling")
     
     print(f"Loaded {len(future_days)} days for labeling")
-    
-    all_future = pd.concat(future_days)
-    all_future = all_future.rename(columns={"stars": "future_stars"})
-    
-    features_df["day1"] = pd.to_datetime(features_df["date"]) + timedelta(days=1)
-    features_df["day2"] = pd.to_datetime(features_df["date"]) + timedelta(days=2)
-    features_df["day1"] = features_df["day1"].dt.strftime("%Y-%m-%d")
-    features_df["day2"] = features_df["day2"].dt.strftime("%Y-%m-%d")
-    
-    day1_stars = features_df.merge(
-        all_future, 
-        left_on=["repo_id", "day1"], 
-        right_on=["repo_id", "future_date"], 
-        how="left"
-    )[["future_stars"]].fillna(0)
-    
-    day2_stars = features_df.merge(
-        all_future, 
-        left_on=["repo_id", "day2"], 
-        right_on=["repo_id", "future_date"], 
-        how="left"
-    )[["future_stars"]].fillna(0)
-    
-    features_df["future_stars"] = day1_stars["future_stars"].values + day2_stars["future_stars"].values
-    features_df["viral"] = (features_df["future_stars"] >= 20).astype(int)
-    features_df = features_df.drop(columns=["future_stars", "day1", "day2"])
-    
-    return features_df
+    return add_labels(features_df, future_days)
 
 def delete_old_data(s3, dates):
     cutoff = (datetime.now(timezone.utc) - timedelta(days=8)).strftime("%Y-%m-%d")
     
-    for date_str in dates:
-        if date_str < cutoff:
-            year, month, day = date_str.split("-")
-            key = f"gold/year={year}/month={month}/day={day}/metrics.parquet"
-            try:
-                s3.delete_object(Bucket=R2_BUCKET, Key=key)
-                print(f"Deleted: {date_str}")
-            except:
-                pass
+    old_dates = [date_str for date_str in dates if date_str < cutoff]
+    if not old_dates:
+        return
+    partitions = list_partitions(s3, "gold", "metrics.parquet")
+    keys = [partitions[date_str]["key"] for date_str in old_dates if date_str in partitions]
+    # plus each day's repo name index
+    keys += [
+        partitions[date_str]["index"]["names"]["key"]
+        for date_str in old_dates if "names" in partitions.get(date_str, {}).get("index", {})
+    ]
+    delete_keys(s3, keys)
+    remove_partitions(s3, "gold", old_dates)
+    print(f"Deleted: {old_dates[0]} to {old_dates[-1]} ({len(keys)} partitions)")
+
+def balance_labels(df):
+    # every viral repo plus a 2% sample of the rest
+    viral = df[df["viral"] == 1]
+    non_viral = df[df["viral"] == 0].sample(frac=0.02, random_state=42)
+    print(f"Balanced: {len(viral)} viral, {len(non_viral)} non-viral")
+    return pd.concat([viral, non_viral]).sample(frac=1, random_state=42)
+
+def register_model(s3, model, scaler, X_test, metrics, train_dates):
+    # Artifacts go to the registry in R2 instead of the checkout; predict.py
+    # picks up whatever models/current.json points at
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifacts = {
+            "model": os.path.join(tmp_dir, "model_viral.pkl"),
+            "scaler": os.path.join(tmp_dir, "scaler_viral.pkl"),
+        }
+        joblib.dump(model, artifacts["model"])
+        joblib.dump(scaler, artifacts["scaler"])
+        
+        if isinstance(model, MLPClassifier):
+            # NumPy export used by predict.py, checked against sklearn on the test split
+            artifacts["inference"] = os.path.join(tmp_dir, "model_viral.npz")
+            export_mlp(model, scaler, artifacts["inference"])
+            diff = check_parity(model, scaler, NumpyMLP.load(artifacts["inference"]), X_test)
+            print(f"NumPy export max diff vs sklearn: {diff:.2e}")
+        
+        return register_version(s3, artifacts, feature_cols, metrics, train_dates)
+
+def evaluate_current(s3, X_test, y_test):
+    # scores the promoted model on the new held-out split, None if nothing is promoted yet
+    if get_current(s3) is None:
+        return None
+    score_current, model_cols = load_current_model(s3, os.path.dirname(os.path.abspath(__file__)))
+    return score(y_test, (score_current(X_test[model_cols])[:, 1] >= 0.5).astype(int))
 
-def retrain():
+def retrain(tournament=False, workers=None):
     s3 = get_s3_client()
-    script_dir = os.path.dirname(os.path.abspath(__file__))
     
     print("Finding available dates...")
     available_dates = get_available_dates(s3)
@@ -98,37 +99,22 @@ def retrain():
         raise ValueError("Need at least 10 days for retraining (7 history + 2 future + 1 target)")
     
     print("\nBuilding features...")
-    all_features = []
+    # every target needs 7 days of history before it and 2 labelable days after it
+    target_dates = available_dates[7:-2]
+    features_df = build_feature_panel(s3, target_dates)
     
-    for i, date_str in enumerate(available_dates):
-        if i < 7: 
-            continue
-        if i >= len(available_dates) - 2: 
-            continue
-        
-        try:
-            df = build_features(date_str)
-            df["date"] = date_str
-            all_features.append(df)
-            print(f"{date_str}: {len(df)} repos")
-        except Exception as e:
-            print(f"{date_str}: Failed - {e}")
-    
-    if not all_features:
+    if features_df.empty:
         raise ValueError("No features could be built")
     
-    features_df = pd.concat(all_features)
+    for date_str, count in features_df.groupby("date").size().items():
+        print(f"{date_str}: {count} repos")
     print(f"\nTotal features: {len(features_df)} rows")
     
     print("\nAdding labels...")
     df = add_labels_vectorized(features_df, s3, available_dates)
     print(f"Viral repos: {df['viral'].sum()}")
     
-    viral = df[df["viral"] == 1]
-    non_viral = df[df["viral"] == 0].sample(frac=0.02, random_state=42)
-    balanced_df = pd.concat([viral, non_viral]).sample(frac=1, random_state=42)
-    
-    print(f"Balanced: {len(viral)} viral, {len(non_viral)} non-viral")
+    balanced_df = balance_labels(df)
     
     X = balanced_df[feature_cols]
     y = balanced_df["viral"]
@@ -139,26 +125,30 @@ def retrain():
     X_train_scaled = scaler_new.fit_transform(X_train)
     X_test_scaled = scaler_new.transform(X_test)
     
-    model_new = MLPClassifier(max_iter=500, random_state=42)
-    model_new.fit(X_train_scaled, y_train)
-    
-    new_f1 = f1_score(y_test, model_new.predict(X_test_scaled))
-    print(f"\nNew model F1: {new_f1:.4f}")
-    
-    # Save new model with timestamp (never overwrite)
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d")
-    model_path = os.path.join(script_dir, f"model_viral_{timestamp}.pkl")
-    scaler_path = os.path.join(script_dir, f"scaler_viral_{timestamp}.pkl")
-    
-    joblib.dump(model_new, model_path)
-    joblib.dump(scaler_new, scaler_path)
-    print(f"Saved: {model_path}")
-    print(f"Saved: {scaler_path}")
-    
-    # Also save as latest (for predict.py to use)
-    joblib.dump(model_new, os.path.join(script_dir, "model_viral.pkl"))
-    joblib.dump(scaler_new, os.path.join(script_dir, "scaler_viral.pkl"))
-    print("Also saved as model_viral.pkl and scaler_viral.pkl")
+    # the plain run fits only the MLP retrain has always used; the tournament
+    # fits every candidate in parallel and keeps the best on the same split
+    names = list(CANDIDATES) if tournament else ["mlp"]
+    print(f"\nTraining {', '.join(names)}...")
+    results, models = run_tournament(X_train_scaled, y_train.to_numpy(), X_test_scaled, y_test.to_numpy(),
+                                     names, workers)
+    best = results[0]
+    model_new = models[best["name"]]
+    print(f"\nBest candidate: {best['name']} (F1 {best['f1']:.4f}, recall {best['recall']:.4f})")
+    
+    current = evaluate_current(s3, X_test, y_test)
+    if current is not None:
+        print(f"Current model: F1 {current['f1']:.4f}, recall {current['recall']:.4f}")
+    better = current is None or (best["f1"] > current["f1"] and best["recall"] >= current["recall"])
+    
+    manifest = register_model(
+        s3, model_new, scaler_new, X_test,
+        metrics={**best, "test_rows": len(X_test), "candidates": results},
+        train_dates={"start": target_dates[0], "end": target_dates[-1], "labels_through": available_dates[-1]},
+    )
+    if better:
+        promote(s3, manifest["version"])
+    else:
+        print(f"Not promoting {manifest['version']}: it doesn't beat the current model")
     
     print("\nCleaning up old data...")
     delete_old_data(s3, available_dates)
@@ -166,4 +156,11 @@ def retrain():
     print("\nRetrain complete!")
 
 if __name__ == "__main__":
-    retrain()
+    parser = argparse.ArgumentParser(description="Retrain the viral model")
+    parser.add_argument("--tournament", action="store_true",
+                        help="Fit every candidate model in parallel and keep the best")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Training processes (default: one per core)")
+    args = parser.parse_args()
+    retrain(tournament=args.tournament, workers=args.workers)
+    write_report(get_s3_client(), "retrain")
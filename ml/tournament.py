@@ -0,0 +1,94 @@
+import os
+import sys
+sys.path.append(".")
+
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.neural_network import MLPClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score, precision_score, recall_score
+from threadpoolctl import threadpool_limits
+
+# Each factory takes the thread budget for its process. Settings follow the
+# comparison in training.ipynb; "mlp" is the model retrain has always shipped.
+def make_mlp(threads):
+    return MLPClassifier(max_iter=500, random_state=42)
+
+def make_mlp_wide(threads):
+    return MLPClassifier(hidden_layer_sizes=(128, 64), max_iter=500, early_stopping=True, random_state=42)
+
+def make_mlp_regularized(threads):
+    return MLPClassifier(hidden_layer_sizes=(64,), alpha=1e-3, max_iter=500, random_state=42)
+
+def make_logistic(threads):
+    return LogisticRegression(class_weight="balanced", max_iter=1000)
+
+def make_lightgbm(threads):
+    from lightgbm import LGBMClassifier
+    return LGBMClassifier(class_weight="balanced", n_estimators=100, n_jobs=threads, verbose=-1, random_state=42)
+
+def make_xgboost(threads):
+    from xgboost import XGBClassifier
+    return XGBClassifier(scale_pos_weight=10, n_estimators=100, tree_method="hist", n_jobs=threads, random_state=42)
+
+CANDIDATES = {
+    "mlp": make_mlp,
+    "mlp_wide": make_mlp_wide,
+    "mlp_regularized": make_mlp_regularized,
+    "logistic": make_logistic,
+    "lightgbm": make_lightgbm,
+    "xgboost": make_xgboost,
+}
+
+def score(y_true, y_pred):
+    return {
+        "f1": float(f1_score(y_true, y_pred, zero_division=0)),
+        "precision": float(precision_score(y_true, y_pred, zero_division=0)),
+        "recall": float(recall_score(y_true, y_pred, zero_division=0)),
+    }
+
+def fit_candidate(name, X_train, y_train, X_test, y_test, threads):
+    # Runs in its own worker process (max_tasks_per_child=1), so ru_maxrss is
+    # this candidate's peak alone; threadpool_limits caps BLAS/OpenMP threads
+    started = time.perf_counter()
+    with threadpool_limits(limits=threads):
+        model = CANDIDATES[name](threads)
+        model.fit(X_train, y_train)
+        result = score(y_test, model.predict(X_test))
+    result["name"] = name
+    result["seconds"] = time.perf_counter() - started
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result, model
+
+def run_tournament(X_train, y_train, X_test, y_test, names=None, workers=None):
+    # Fits the candidates in parallel on the same (already scaled) split and
+    # returns (results sorted best first, {name: fitted model})
+    names = list(names or CANDIDATES)
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(names)))
+    threads = max(1, cpus // workers)
+    print(f"Fitting {len(names)} candidates on {workers} processes x {threads} threads")
+
+    results, models = [], {}
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
+        futures = {
+            pool.submit(fit_candidate, name, X_train, y_train, X_test, y_test, threads): name
+            for name in names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result, model = future.result()
+            except Exception as e:
+                print(f"  {name}: failed ({e})")
+                continue
+            results.append(result)
+            models[name] = model
+            print(f"  {name}: F1 {result['f1']:.4f}, recall {result['recall']:.4f}, "
+                  f"{result['seconds']:.1f}s, peak {result['peak_rss_mb']:.0f} MB")
+
+    if not results:
+        raise RuntimeError("Every candidate failed to train")
+    results.sort(key=lambda r: (r["f1"], r["recall"]), reverse=True)
+    return results, models
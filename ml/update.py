@@ -0,0 +1,108 @@
+import sys
+sys.path.append(".")
+
+import argparse
+import copy
+import joblib
+from sklearn.model_selection import train_test_split
+from ingest.config import get_s3_client
+from ingest.telemetry import write_report
+from features import load_gold_days, build_feature_panel
+from feature_store import shift_date
+from labels import add_labels
+from registry import get_current, fetch_artifacts, promote
+from retrain import feature_cols, get_available_dates, balance_labels, register_model
+from tournament import score
+
+# passes of partial_fit over the new day's training rows
+UPDATE_EPOCHS = 5
+# held-out recall and F1 the update may lose before it's rejected; F1 keeps a
+# degenerate all-positive model (recall 1.0) from passing on recall alone
+RECALL_TOLERANCE = 0.0
+F1_TOLERANCE = 0.0
+
+def update_model(target_date=None, epochs=UPDATE_EPOCHS):
+    # Warm-starts the promoted model on one day: the newest gold day that has
+    # its two label days after it. Costs one day of features instead of the
+    # full history; the monthly retrain still refits from scratch.
+    s3 = get_s3_client()
+    current = get_current(s3)
+    if current is None:
+        print("No registered model to update, run retrain.py first")
+        return None
+    manifest = current["manifest"]
+
+    if target_date is None:
+        available_dates = get_available_dates(s3)
+        if len(available_dates) < 3:
+            print(f"Need a gold day plus its two label days, found {len(available_dates)} days, skipping")
+            return None
+        target_date = shift_date(available_dates[-1], -2)
+    trained_through = manifest.get("train_dates", {}).get("end")
+    if trained_through and target_date <= trained_through:
+        print(f"Model {manifest['version']} already covers {target_date}, nothing to do")
+        return None
+
+    paths = fetch_artifacts(s3, manifest)
+    model = joblib.load(paths["model"])
+    scaler = joblib.load(paths["scaler"])
+    if not hasattr(model, "partial_fit"):
+        print(f"{type(model).__name__} can't be updated incrementally, skipping")
+        return None
+
+    print(f"Updating model {manifest['version']} with {target_date}")
+    label_dates = [shift_date(target_date, 1), shift_date(target_date, 2)]
+    future_days = load_gold_days(s3, label_dates)
+    if len(future_days) < len(label_dates):
+        raise ValueError(f"Missing gold days to label {target_date}: {sorted(set(label_dates) - set(future_days))}")
+
+    features_df = build_feature_panel(s3, [target_date])
+    if features_df.empty:
+        raise ValueError(f"No features could be built for {target_date}")
+    df = balance_labels(add_labels(features_df, future_days))
+    if df["viral"].nunique() < 2:
+        print(f"{target_date} has only one class after labeling, skipping")
+        return None
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[feature_cols], df["viral"], test_size=0.2, random_state=42
+    )
+    before = score(y_test, model.predict(scaler.transform(X_test)))
+
+    model_new = copy.deepcopy(model)
+    # The scaler stays frozen: refitting it would rescale every input under
+    # weights fitted to the old scale. New values outside its range come out
+    # past [0, 1], exactly as predict.py will feed them to the model.
+    X_train_scaled = scaler.transform(X_train)
+    for epoch in range(epochs):
+        model_new.partial_fit(X_train_scaled, y_train)
+    after = score(y_test, model_new.predict(scaler.transform(X_test)))
+
+    print(f"Held-out {target_date}: recall {before['recall']:.4f} -> {after['recall']:.4f}, "
+          f"F1 {before['f1']:.4f} -> {after['f1']:.4f}")
+    if after["recall"] < before["recall"] - RECALL_TOLERANCE:
+        print("Rejected: the update lowers held-out recall")
+        return None
+    if after["f1"] < before["f1"] - F1_TOLERANCE:
+        print("Rejected: the update lowers held-out F1")
+        return None
+
+    train_dates = {**manifest.get("train_dates", {}), "end": target_date, "labels_through": label_dates[-1]}
+    new_manifest = register_model(
+        s3, model_new, scaler, X_test,
+        metrics={
+            **after, "name": manifest.get("metrics", {}).get("name", "mlp"),
+            "test_rows": len(X_test), "parent": manifest["version"], "parent_metrics": before,
+        },
+        train_dates=train_dates,
+    )
+    promote(s3, new_manifest["version"])
+    return new_manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the promoted model with one new day")
+    parser.add_argument("--date", default=None, help="Day to train on (default: newest labelable day)")
+    parser.add_argument("--epochs", type=int, default=UPDATE_EPOCHS)
+    args = parser.parse_args()
+    update_model(args.date, args.epochs)
+    write_report(get_s3_client(), "update")